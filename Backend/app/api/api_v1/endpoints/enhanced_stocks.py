@@ -12,18 +12,38 @@ Provides:
 """
 
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Set
+import asyncio
 import logging
 
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db
 from app.models.models import Stock
 from app.schemas.schemas import StockCreate
+from app.services.enhanced_stock_service import enhanced_stock_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Strong references to running seed tasks so they are not garbage collected
+seed_tasks: Set[asyncio.Task] = set()
+
+
+async def run_seed_job(force_refresh: bool) -> int:
+    """
+    Populate the stock database in a fresh session
+    """
+    db = SessionLocal()
+    try:
+        return await enhanced_stock_service.populate_database_comprehensive(db, force_refresh=force_refresh)
+    except Exception as e:
+        logger.error(f"Background stock seeding failed: {e}")
+        return 0
+    finally:
+        db.close()
+
 @router.get("/")
 async def stock_api_info():
     """API information endpoint"""
@@ -115,12 +135,11 @@ async def seed_stocks_enhanced(
     """
     try:
         if background:
-            # Run as background task
-            background_tasks.add_task(
-                enhanced_stock_service.populate_database_comprehensive, 
-                db, 
-                force_refresh=force
-            )
+            # Run as a background task with its own session - the request's
+            # session is closed as soon as this response is sent
+            task = asyncio.create_task(run_seed_job(force))
+            seed_tasks.add(task)
+            task.add_done_callback(seed_tasks.discard)
             return {
                 "message": "Enhanced stock seeding started in background",
                 "force_refresh": force,
@@ -176,8 +195,14 @@ async def stock_database_health_check(db: Session = Depends(get_db)):
     Following StockManagement.py health monitoring approach
     """
     try:
-        total_stocks = db.query(Stock).count()
-        active_stocks = db.query(Stock).filter(Stock.is_active == True).count()
+        counts = db.execute(
+            select(
+                func.count(Stock.id).label('total'),
+                func.coalesce(func.sum(case((Stock.is_active == True, 1), else_=0)), 0).label('active')
+            )
+        ).one()
+        total_stocks = counts.total
+        active_stocks = counts.active
         
         # Health criteria
         is_healthy = total_stocks > 100 and active_stocks > 50
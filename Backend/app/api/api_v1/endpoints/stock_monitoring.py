@@ -7,7 +7,7 @@ get statistics, and manually trigger stock updates if needed.
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, func, select
 from typing import Dict, Any
 
 from app.core.database import get_db
@@ -22,9 +22,18 @@ def get_stock_statistics(db: Session = Depends(get_db)):
     Get comprehensive stock database statistics
     """
     try:
-        # Basic counts
-        total_stocks = db.query(Stock).count()
-        active_stocks = db.query(Stock).filter(Stock.is_active == True).count()
+        # Counts and price statistics in a single scan
+        totals = db.execute(
+            select(
+                func.count(Stock.id).label('total'),
+                func.coalesce(func.sum(case((Stock.is_active == True, 1), else_=0)), 0).label('active'),
+                func.min(Stock.current_price).label('min_price'),
+                func.max(Stock.current_price).label('max_price'),
+                func.avg(Stock.current_price).label('avg_price')
+            )
+        ).one()
+        total_stocks = totals.total
+        active_stocks = totals.active
         
         # Exchange breakdown
         exchange_stats = db.query(
@@ -38,13 +47,6 @@ def get_stock_statistics(db: Session = Depends(get_db)):
             func.count(Stock.id).label('count')
         ).group_by(Stock.sector).all()
         
-        # Price statistics
-        price_stats = db.query(
-            func.min(Stock.current_price).label('min_price'),
-            func.max(Stock.current_price).label('max_price'),
-            func.avg(Stock.current_price).label('avg_price')
-        ).first()
-        
         return {
             "total_stocks": total_stocks,
             "active_stocks": active_stocks,
@@ -55,9 +57,9 @@ def get_stock_statistics(db: Session = Depends(get_db)):
                 sector or "Unknown": count for sector, count in sector_stats
             },
             "price_statistics": {
-                "min_price": float(price_stats.min_price) if price_stats.min_price else 0,
-                "max_price": float(price_stats.max_price) if price_stats.max_price else 0,
-                "avg_price": float(price_stats.avg_price) if price_stats.avg_price else 0
+                "min_price": float(totals.min_price) if totals.min_price else 0,
+                "max_price": float(totals.max_price) if totals.max_price else 0,
+                "avg_price": float(totals.avg_price) if totals.avg_price else 0
             },
             "status": "healthy" if total_stocks > 100 else "needs_population"
         }
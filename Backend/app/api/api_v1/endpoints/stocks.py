@@ -5,13 +5,16 @@ import logging
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status, BackgroundTasks
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, get_current_active_user, get_current_active_admin
+from app.core.database import SessionLocal
 from app.crud import stock as stock_crud
 from app.models.models import User, Stock
 from app.schemas.schemas import Stock as StockSchema, StockCreate, StockUpdate
 from app.core.json_utils import safe_jsonable_encoder, SafeJSONResponse
+from app.core.cache import cache_response
 from app.services.real_time_prices import real_time_fetcher as old_fetcher
 from app.services.real_time_fetcher import real_time_fetcher
 from app.services.market_timing import market_timer
@@ -22,6 +25,40 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Validates and serializes a whole result list in one pass
+stock_list_adapter = TypeAdapter(List[StockSchema])
+
+
+def clean_float(value: Optional[float]) -> Optional[float]:
+    """
+    Replace NaN/infinity with 0.0
+    """
+    if value is not None and (math.isnan(value) or math.isinf(value)):
+        return 0.0
+    return value
+
+
+def build_stock_payload(stocks: List[Stock]) -> List[Dict[str, Any]]:
+    """
+    Convert stock rows to JSON-ready dicts with NaN-safe price change metrics
+    """
+    result = stock_list_adapter.validate_python(stocks, from_attributes=True)
+    for stock_data in result:
+        stock_data.current_price = clean_float(stock_data.current_price)
+        stock_data.previous_close = clean_float(stock_data.previous_close)
+        current_price = stock_data.current_price
+        previous_close = stock_data.previous_close
+
+        if previous_close and previous_close > 0 and current_price is not None and current_price > 0:
+            price_change = current_price - previous_close
+            stock_data.price_change = clean_float(price_change)
+            stock_data.price_change_percent = clean_float((price_change / previous_close) * 100)
+        else:
+            stock_data.price_change = 0.0
+            stock_data.price_change_percent = 0.0
+
+    return stock_list_adapter.dump_python(result, mode="json")
+
 
 @router.get("/", response_class=SafeJSONResponse)
 async def read_stocks(
@@ -113,42 +150,7 @@ async def read_stocks(
             }
         ])
     
-    # Calculate price change metrics for each stock with NaN safety
-    result = []
-    for stock in stocks:
-        stock_data = StockSchema.from_orm(stock)
-        
-        # Clean any NaN values from the base stock data
-        if stock.current_price is not None and (math.isnan(stock.current_price) or math.isinf(stock.current_price)):
-            stock_data.current_price = 0.0
-        if stock.previous_close is not None and (math.isnan(stock.previous_close) or math.isinf(stock.previous_close)):
-            stock_data.previous_close = 0.0
-            
-        if (stock.previous_close and stock.previous_close > 0 and 
-            stock.current_price is not None and stock.current_price > 0):
-            try:
-                price_change = stock.current_price - stock.previous_close
-                price_change_percent = (price_change / stock.previous_close) * 100
-                
-                # Ensure no NaN or infinity values
-                if not (math.isnan(price_change) or math.isinf(price_change)):
-                    stock_data.price_change = price_change
-                else:
-                    stock_data.price_change = 0.0
-                    
-                if not (math.isnan(price_change_percent) or math.isinf(price_change_percent)):
-                    stock_data.price_change_percent = price_change_percent
-                else:
-                    stock_data.price_change_percent = 0.0
-            except (ZeroDivisionError, ValueError, TypeError):
-                stock_data.price_change = 0.0
-                stock_data.price_change_percent = 0.0
-        else:
-            stock_data.price_change = 0.0
-            stock_data.price_change_percent = 0.0
-        result.append(stock_data)
-    
-    return safe_jsonable_encoder(result)
+    return build_stock_payload(stocks)
 
 
 @router.post("/", response_model=StockSchema)
@@ -172,6 +174,7 @@ def create_stock(
 
 
 @router.get("/search", response_class=SafeJSONResponse)
+@cache_response("stocks:search", ["query", "limit", "refresh_prices"], ttl=price_scheduler.get_update_interval)
 async def search_stocks(
     *,
     db: Session = Depends(get_db),
@@ -256,44 +259,7 @@ async def search_stocks(
         
         return safe_jsonable_encoder(filtered_stocks if filtered_stocks else demo_stocks)
     
-    # Calculate price change metrics for each stock with NaN safety (same as main endpoint)
-    result = []
-    for stock in stocks:
-        stock_data = StockSchema.from_orm(stock)
-        
-        # Clean any NaN values from the base stock data
-        if stock.current_price is not None and (math.isnan(stock.current_price) or math.isinf(stock.current_price)):
-            stock_data.current_price = 0.0
-            
-        if stock.previous_close is not None and (math.isnan(stock.previous_close) or math.isinf(stock.previous_close)):
-            stock_data.previous_close = 0.0
-            
-        if (stock.previous_close and stock.previous_close > 0 and 
-            stock.current_price is not None and stock.current_price > 0):
-            try:
-                price_change = stock.current_price - stock.previous_close
-                price_change_percent = (price_change / stock.previous_close) * 100
-                
-                # Ensure no NaN or infinity values
-                if not (math.isnan(price_change) or math.isinf(price_change)):
-                    stock_data.price_change = price_change
-                else:
-                    stock_data.price_change = 0.0
-                    
-                if not (math.isnan(price_change_percent) or math.isinf(price_change_percent)):
-                    stock_data.price_change_percent = price_change_percent
-                else:
-                    stock_data.price_change_percent = 0.0
-            except (ZeroDivisionError, ValueError, TypeError):
-                stock_data.price_change = 0.0
-                stock_data.price_change_percent = 0.0
-        else:
-            stock_data.price_change = 0.0
-            stock_data.price_change_percent = 0.0
-            
-        result.append(stock_data)
-    
-    return safe_jsonable_encoder(result)
+    return build_stock_payload(stocks)
 
 
 # Real-time market status and price endpoints (must be before /{stock_id} route)
@@ -456,6 +422,7 @@ def stop_real_time_updates(
 
 
 @router.get("/{stock_id}", response_class=SafeJSONResponse)
+@cache_response("stocks:id", ["stock_id", "refresh_price"], ttl=price_scheduler.get_update_interval)
 async def read_stock(
     *,
     db: Session = Depends(get_db),
@@ -531,7 +498,7 @@ async def read_stock(
             )
     
     # Calculate price change metrics with NaN safety
-    stock_data = StockSchema.from_orm(stock)
+    stock_data = StockSchema.model_validate(stock)
     
     # Clean any NaN values from the base stock data
     if stock.current_price is not None and (math.isnan(stock.current_price) or math.isinf(stock.current_price)):
@@ -608,6 +575,19 @@ def refresh_stock(
     return stock
 
 
+def refresh_all_stocks_job() -> None:
+    """
+    Refresh all stocks in a dedicated database session
+    """
+    db = SessionLocal()
+    try:
+        stock_crud.refresh_all_stocks(db)
+    except Exception as e:
+        logger.error(f"Background stock refresh failed: {e}")
+    finally:
+        db.close()
+
+
 @router.post("/refresh-all", response_model=Dict[str, Any])
 def refresh_all_stocks(
     *,
@@ -618,8 +598,9 @@ def refresh_all_stocks(
     """
     Refresh all stocks from Yahoo Finance (admin only)
     """
-    # Run in background to avoid timeout
-    background_tasks.add_task(stock_crud.refresh_all_stocks, db)
+    # Run in background to avoid timeout, in a fresh session since the
+    # request's session is closed once the response is sent
+    background_tasks.add_task(refresh_all_stocks_job)
     
     return {
         "message": "Stock refresh started in background",
@@ -657,6 +638,8 @@ def update_stock_prices(
 
 
 @router.get("/{symbol}/history", response_class=SafeJSONResponse)
+@cache_response("stocks:history", ["symbol", "timeframe", "interval"], ttl=price_scheduler.get_update_interval,
+                key_normalizers={"symbol": str.upper})
 async def get_stock_history(
     symbol: str,
     timeframe: str = Query("1d", description="Timeframe: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y"),
@@ -736,6 +719,8 @@ async def get_stock_history(
 
 
 @router.get("/symbol/{symbol}", response_class=SafeJSONResponse)
+@cache_response("stocks:symbol", ["symbol"], ttl=price_scheduler.get_update_interval, local_ttl=60,
+                key_normalizers={"symbol": str.upper})
 async def get_stock_by_symbol(
     symbol: str,
     db: Session = Depends(get_db)
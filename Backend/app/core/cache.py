@@ -0,0 +1,229 @@
+"""
+Key/value cache backed by Redis with an in-process fallback
+
+Redis is optional: if it is not reachable the cache transparently falls back
+to a per-process dictionary with the same TTL semantics, so callers never
+need to handle cache errors themselves.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+import redis
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client: Optional[redis.Redis] = None
+_redis_checked = False
+
+# In-process fallback (and L1 tier): key -> (expires_at, value)
+# Guarded by _local_lock since cache_response touches it from worker threads
+_local_cache: Dict[str, Tuple[float, Any]] = {}
+_local_lock = threading.Lock()
+LOCAL_CACHE_MAX_ENTRIES = 4096
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """
+    Get the shared Redis client, or None if Redis is unreachable
+    The connection is probed once per process.
+    """
+    global _redis_client, _redis_checked
+
+    if not _redis_checked:
+        _redis_checked = True
+        try:
+            client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                socket_connect_timeout=1,
+                socket_timeout=1,
+                decode_responses=True,
+            )
+            client.ping()
+            _redis_client = client
+            logger.info(f"Connected to Redis at {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+        except redis.RedisError as e:
+            logger.info(f"Redis unavailable ({e}), using in-process cache")
+
+    return _redis_client
+
+
+def _local_get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    Get unexpired values from the in-process cache
+    """
+    now = time.monotonic()
+    hits = {}
+    with _local_lock:
+        for key in keys:
+            entry = _local_cache.get(key)
+            if entry is not None and entry[0] > now:
+                hits[key] = entry[1]
+    return hits
+
+
+def _local_set_many(mapping: Dict[str, Any], ttl: float) -> None:
+    """
+    Store values in the in-process cache, evicting expired and then
+    oldest entries once it grows past LOCAL_CACHE_MAX_ENTRIES
+    """
+    expires_at = time.monotonic() + ttl
+    with _local_lock:
+        for key, value in mapping.items():
+            _local_cache.pop(key, None)
+            _local_cache[key] = (expires_at, value)
+
+        if len(_local_cache) > LOCAL_CACHE_MAX_ENTRIES:
+            now = time.monotonic()
+            for key in [key for key, (expires, _) in _local_cache.items() if expires <= now]:
+                del _local_cache[key]
+            while len(_local_cache) > LOCAL_CACHE_MAX_ENTRIES:
+                del _local_cache[next(iter(_local_cache))]
+
+
+def get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    Get cached values for the given keys, omitting misses
+    """
+    keys = list(keys)
+    if not keys:
+        return {}
+
+    client = get_redis()
+    if client is not None:
+        try:
+            return {
+                key: json.loads(value)
+                for key, value in zip(keys, client.mget(keys))
+                if value is not None
+            }
+        except redis.RedisError as e:
+            logger.warning(f"Redis MGET failed, falling back to in-process cache: {e}")
+
+    return _local_get_many(keys)
+
+
+def set_many(mapping: Dict[str, Any], ttl: int) -> None:
+    """
+    Cache all values in the mapping for ttl seconds
+    """
+    if not mapping:
+        return
+
+    client = get_redis()
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.set(key, json.dumps(value), ex=ttl)
+            pipe.execute()
+            return
+        except redis.RedisError as e:
+            logger.warning(f"Redis SET failed, falling back to in-process cache: {e}")
+
+    _local_set_many(mapping, ttl)
+
+
+def get_value(key: str) -> Optional[Any]:
+    """
+    Get a single cached value, or None on a miss
+    """
+    return get_many([key]).get(key)
+
+
+def set_value(key: str, value: Any, ttl: int) -> None:
+    """
+    Cache a single value for ttl seconds
+    """
+    set_many({key: value}, ttl)
+
+
+def acquire_lock(key: str, ttl: int) -> bool:
+    """
+    Try to take a lock shared by all workers (SET NX EX)
+    Returns False if another holder has it. Without Redis the lock
+    only covers the current process.
+    """
+    client = get_redis()
+    if client is not None:
+        try:
+            return bool(client.set(key, "1", nx=True, ex=ttl))
+        except redis.RedisError as e:
+            logger.warning(f"Redis lock failed for {key}, using in-process lock: {e}")
+
+    # Check and set under one lock hold so two threads cannot both win
+    now = time.monotonic()
+    with _local_lock:
+        entry = _local_cache.get(key)
+        if entry is not None and entry[0] > now:
+            return False
+        _local_cache.pop(key, None)
+        _local_cache[key] = (now + ttl, "1")
+    return True
+
+
+def delete_prefix(prefix: str) -> None:
+    """
+    Drop every cached key starting with prefix
+    """
+    client = get_redis()
+    if client is not None:
+        try:
+            keys = list(client.scan_iter(match=f"{prefix}*", count=500))
+            if keys:
+                client.delete(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"Redis DEL failed for prefix {prefix}: {e}")
+
+    with _local_lock:
+        for key in [key for key in _local_cache if key.startswith(prefix)]:
+            del _local_cache[key]
+
+
+def cache_response(prefix: str, key_params: Sequence[str], ttl: Union[int, Callable[[], int]],
+                   local_ttl: Optional[int] = None,
+                   key_normalizers: Optional[Dict[str, Callable[[Any], Any]]] = None):
+    """
+    Cache an async endpoint's JSON result, keyed by the named parameters
+    ttl may be a callable so the expiry can follow market hours.
+    With local_ttl, hot results are also kept in-process (checked before Redis).
+    key_normalizers maps a parameter to a function applied before it enters the key,
+    so equivalent values (e.g. "tcs" and "TCS") share one entry.
+    Exceptions (e.g. HTTPException) are never cached.
+    """
+    normalizers = key_normalizers or {}
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = ":".join([prefix] + [
+                str(normalizers[name](kwargs.get(name)) if name in normalizers else kwargs.get(name))
+                for name in key_params
+            ])
+            if local_ttl:
+                local_hit = _local_get_many([key])
+                if key in local_hit:
+                    return local_hit[key]
+
+            # Redis calls are blocking, so keep them off the event loop
+            cached = await asyncio.to_thread(get_value, key)
+            if cached is None:
+                cached = jsonable_encoder(await func(*args, **kwargs))
+                expiry = ttl() if callable(ttl) else ttl
+                await asyncio.to_thread(set_value, key, cached, expiry)
+            else:
+                expiry = ttl() if callable(ttl) else ttl
+
+            if local_ttl:
+                _local_set_many({key: cached}, min(local_ttl, expiry))
+            return cached
+        return wrapper
+    return decorator
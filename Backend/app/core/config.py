@@ -1,4 +1,5 @@
 import os
+from functools import cached_property
 from typing import Any, Dict, List, Optional, Union
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings
@@ -22,10 +23,15 @@ class Settings(BaseSettings):
         # Note: Additional domains added dynamically in cors_origins_list
     ]
     
-    @property
+    @cached_property
     def cors_origins_list(self) -> List[str]:
-        """Get CORS origins including dynamic Railway/Vercel domains"""
-        origins = self.CORS_ORIGINS.copy()
+        """Get CORS origins including dynamic Railway/Vercel domains (computed once)"""
+        # CORS_ALLOW_ORIGINS (comma-separated) replaces the default list
+        allow_origins = os.getenv("CORS_ALLOW_ORIGINS")
+        if allow_origins:
+            origins = [origin.strip() for origin in allow_origins.split(",") if origin.strip()]
+        else:
+            origins = self.CORS_ORIGINS.copy()
         
         # Add Railway domain if available
         railway_domain = os.getenv("RAILWAY_PUBLIC_DOMAIN")
@@ -1,11 +1,43 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 
+# SQLite is only meant for local development; production runs on PostgreSQL
+IS_SQLITE = settings.SQLALCHEMY_DATABASE_URI.startswith("sqlite")
+
+# Rows per multi-row INSERT when SQLAlchemy pages a bulk executemany
+INSERTMANYVALUES_PAGE_SIZE = 1000
+
 # Create the SQLAlchemy engine
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+if IS_SQLITE:
+    engine = create_engine(
+        settings.SQLALCHEMY_DATABASE_URI,
+        connect_args={"check_same_thread": False, "timeout": 30},
+        pool_pre_ping=True,
+        insertmanyvalues_page_size=INSERTMANYVALUES_PAGE_SIZE
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        """
+        WAL lets readers proceed during population writes
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        cursor.execute("PRAGMA cache_size=-65536")  # 64 MB
+        cursor.close()
+else:
+    engine_options = {"pool_pre_ping": True, "insertmanyvalues_page_size": INSERTMANYVALUES_PAGE_SIZE}
+    if make_url(settings.SQLALCHEMY_DATABASE_URI).get_driver_name() == "psycopg2":
+        # Also batch executemany UPDATEs (bulk_update_mappings) via execute_batch
+        engine_options["executemany_mode"] = "values_plus_batch"
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, **engine_options)
 
 # Create a session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
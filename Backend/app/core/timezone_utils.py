@@ -1,13 +1,19 @@
 """
 Timezone utilities for Indian Standard Time (IST)
 """
-import pytz
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
 from typing import Optional
 from app.core.config import settings
 
 # Indian Standard Time zone
-IST = pytz.timezone(settings.TIMEZONE)
+IST = ZoneInfo(settings.TIMEZONE)
+
+# Asia/Kolkata has been a fixed UTC+05:30 with no DST since 1945, so for the default
+# zone naive UTC timestamps can be shifted by a constant instead of a tz lookup
+IST_OFFSET = timedelta(hours=5, minutes=30)
+IST_ISO_SUFFIX = "+05:30" if settings.TIMEZONE == "Asia/Kolkata" else None
 
 def get_ist_now() -> datetime:
     """
@@ -21,7 +27,7 @@ def utc_to_ist(utc_dt: datetime) -> datetime:
     """
     if utc_dt.tzinfo is None:
         # If datetime is naive, assume it's UTC
-        utc_dt = pytz.utc.localize(utc_dt)
+        utc_dt = utc_dt.replace(tzinfo=timezone.utc)
     return utc_dt.astimezone(IST)
 
 def ist_to_utc(ist_dt: datetime) -> datetime:
@@ -30,8 +36,8 @@ def ist_to_utc(ist_dt: datetime) -> datetime:
     """
     if ist_dt.tzinfo is None:
         # If datetime is naive, assume it's IST
-        ist_dt = IST.localize(ist_dt)
-    return ist_dt.astimezone(pytz.utc)
+        ist_dt = ist_dt.replace(tzinfo=IST)
+    return ist_dt.astimezone(timezone.utc)
 
 def format_ist_datetime(dt: Optional[datetime] = None, format_str: str = "%d/%m/%Y, %I:%M:%S %p") -> str:
     """
@@ -43,7 +49,7 @@ def format_ist_datetime(dt: Optional[datetime] = None, format_str: str = "%d/%m/
     
     # Convert to IST if needed
     if dt.tzinfo is None:
-        dt = IST.localize(dt)
+        dt = dt.replace(tzinfo=IST)
     elif dt.tzinfo != IST:
         dt = dt.astimezone(IST)
     
@@ -63,14 +69,24 @@ def format_ist_for_api(dt: Optional[datetime] = None) -> str:
     # Convert to IST if needed
     if dt.tzinfo is None:
         # Database timestamps are stored as naive UTC - convert to IST
-        utc_dt = pytz.utc.localize(dt)
-        dt = utc_dt.astimezone(IST)
+        return _naive_utc_to_ist_iso(dt)
     elif dt.tzinfo != IST:
         dt = dt.astimezone(IST)
     
     # Return ISO format with timezone info
     return dt.isoformat()
 
+@lru_cache(maxsize=4096)
+def _naive_utc_to_ist_iso(dt: datetime) -> str:
+    """
+    ISO string in IST for a naive UTC datetime
+    Cached since the same stored timestamps are formatted on every listing.
+    """
+    if IST_ISO_SUFFIX is not None:
+        # Naive isoformat plus a literal offset skips the tzinfo utcoffset() call
+        return (dt + IST_OFFSET).isoformat() + IST_ISO_SUFFIX
+    return dt.replace(tzinfo=timezone.utc).astimezone(IST).isoformat()
+
 def get_ist_timestamp() -> datetime:
     """
     Get current timestamp in IST (timezone-aware)
@@ -1,11 +1,24 @@
 from typing import List, Optional, Dict, Any, Union
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import bindparam, func, or_, select
 
 from app.models.models import Stock
 from app.schemas.schemas import StockCreate, StockUpdate
 from app.services.stock_data import StockDataService  # Added import for stock data service
 
+# Built once at import; per call only the bound values change
+SEARCH_STMT = (
+    select(Stock)
+    .where(
+        Stock.is_active == True,
+        or_(
+            func.lower(Stock.symbol).like(bindparam("prefix")),
+            func.lower(Stock.name).like(bindparam("pattern"))
+        )
+    )
+    .limit(bindparam("limit"))
+)
+
 
 def get_by_id(db: Session, stock_id: int) -> Optional[Stock]:
     """
@@ -113,14 +126,13 @@ def search(
     limit: int = 10
 ) -> List[Stock]:
     """
-    Search for stocks by name or symbol
+    Search for stocks by symbol prefix or name substring (case-insensitive)
     """
-    return db.query(Stock).filter(
-        and_(
-            Stock.is_active == True,
-            (Stock.symbol.ilike(f"%{query}%") | Stock.name.ilike(f"%{query}%"))
-        )
-    ).limit(limit).all()
+    query_lower = query.lower()
+    return db.scalars(
+        SEARCH_STMT,
+        {"prefix": f"{query_lower}%", "pattern": f"%{query_lower}%", "limit": limit}
+    ).all()
 
 
 def refresh_stock_data(db: Session, stock: Stock) -> Stock:
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Boolean, Column, String, Integer, Float, ForeignKey, DateTime, Text, Enum
+from sqlalchemy import Boolean, Column, String, Integer, Float, ForeignKey, DateTime, Text, Enum, Index, func
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -57,6 +57,23 @@ class Stock(Base):
     positions = relationship("Position", back_populates="stock")
     transactions = relationship("Transaction", back_populates="stock")
 
+    # Support case-insensitive prefix search and active-only filtering.
+    # text_pattern_ops lets PostgreSQL use the index for LIKE 'q%' under
+    # any collation; substring name matches ('%q%') can't use a btree index
+    __table_args__ = (
+        Index(
+            "ix_stocks_symbol_prefix",
+            func.lower(symbol).label("symbol_lower"),
+            postgresql_ops={"symbol_lower": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_stocks_active",
+            is_active,
+            postgresql_where=is_active.is_(True),
+            sqlite_where=is_active.is_(True),
+        ),
+    )
+
 
 class Position(Base):
     """Position model for storing user's stock holdings"""
@@ -5,21 +5,41 @@ Fetches from NSE/BSE APIs and web sources to get 3000+ stocks automatically
 
 import asyncio
 import logging
-import requests
+import threading
+from contextlib import aclosing
+import httpx
 import yfinance as yf
 import pandas as pd
-from typing import List, Dict, Set
+from typing import AsyncIterator, List, Dict, Optional, Set
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 import time
-import json
+import orjson
 
+from app.core import cache
 from app.core.database import SessionLocal
 from app.models.models import Stock
+from app.services.real_time_fetcher import nse_limiter, yahoo_limiter
+from app.services.stock_population import UPSERT_INSERTS, upsert_chunk_size
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# yf.download keeps its results in module globals, so only one may run at a time
+# (each download still fetches its tickers in parallel with threads=True)
+YF_DOWNLOAD_LOCK = threading.Lock()
+
+# Popular BSE stocks that are also on NSE, built once at import
+POPULAR_BSE_STOCKS = tuple(
+    {'symbol': symbol, 'name': symbol, 'exchange': 'BSE', 'sector': 'Unknown'}
+    for symbol in (
+        'RELIANCE', 'TCS', 'HDFCBANK', 'INFY', 'HINDUNILVR',
+        'ICICIBANK', 'KOTAKBANK', 'BHARTIARTL', 'ITC', 'SBIN',
+        'BAJFINANCE', 'ASIANPAINT', 'MARUTI', 'AXISBANK', 'LT'
+    )
+)
+
 class ComprehensiveIndianStockFetcher:
     """
     Fetch ALL active Indian stocks from multiple sources
@@ -27,13 +47,33 @@ class ComprehensiveIndianStockFetcher:
     """
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Referer': 'https://www.nseindia.com/'
-        })
+        self.http_client: Optional[httpx.AsyncClient] = None
+    
+    def get_http_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared async HTTP client, creating it on first use
+        """
+        if self.http_client is None or self.http_client.is_closed:
+            self.http_client = httpx.AsyncClient(
+                headers={
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                    'Accept': 'application/json, text/plain, */*',
+                    'Accept-Language': 'en-US,en;q=0.9',
+                    'Referer': 'https://www.nseindia.com/'
+                },
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+                follow_redirects=True
+            )
+        return self.http_client
+    
+    async def close(self):
+        """
+        Close the shared HTTP client
+        """
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
         
     async def fetch_all_nse_stocks(self) -> List[Dict]:
         """
@@ -43,15 +83,17 @@ class ComprehensiveIndianStockFetcher:
         logger.info("🔍 Fetching ALL NSE stocks from official APIs...")
         
         all_stocks = []
+        client = self.get_http_client()
         
         # Method 1: NSE Equity List API
         try:
             logger.info("📊 Fetching from NSE Equity List API...")
             url = "https://www.nseindia.com/api/equity-stockIndices?index=SECURITIES%20IN%20F%26O"
-            response = self.session.get(url, timeout=30)
+            await nse_limiter.acquire()
+            response = await client.get(url)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 for stock in data.get('data', []):
                     all_stocks.append({
                         'symbol': stock['symbol'],
@@ -80,9 +122,10 @@ class ComprehensiveIndianStockFetcher:
                 url = f'https://www.nseindia.com/api/equity-stockIndices?index={index}'
                 logger.info(f"📈 Fetching {index.replace('%20', ' ')}")
                 
-                response = self.session.get(url, timeout=30)
+                await nse_limiter.acquire()
+                response = await client.get(url)
                 if response.status_code == 200:
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     
                     for stock in data.get('data', []):
                         all_stocks.append({
@@ -95,8 +138,6 @@ class ComprehensiveIndianStockFetcher:
                     
                     logger.info(f"✅ Got {len(data.get('data', []))} stocks from {index.replace('%20', ' ')}")
                 
-                await asyncio.sleep(1)  # Rate limiting
-                
             except Exception as e:
                 logger.warning(f"Failed to fetch {index}: {e}")
                 continue
@@ -113,10 +154,11 @@ class ComprehensiveIndianStockFetcher:
             for char in search_chars:
                 try:
                     search_url = f"{url}{char}"
-                    response = self.session.get(search_url, timeout=15)
+                    await nse_limiter.acquire()
+                    response = await client.get(search_url, timeout=15.0)
                     
                     if response.status_code == 200:
-                        data = response.json()
+                        data = orjson.loads(response.content)
                         symbols = data.get('symbols', [])
                         
                         for symbol_data in symbols:
@@ -130,8 +172,6 @@ class ComprehensiveIndianStockFetcher:
                         
                         logger.info(f"✅ Got {len(symbols)} symbols starting with '{char}'")
                     
-                    await asyncio.sleep(0.5)  # Rate limiting
-                    
                 except Exception as e:
                     logger.warning(f"Search failed for '{char}': {e}")
                     continue
@@ -139,12 +179,8 @@ class ComprehensiveIndianStockFetcher:
         except Exception as e:
             logger.warning(f"NSE search method failed: {e}")
         
-        # Remove duplicates
-        unique_stocks = {}
-        for stock in all_stocks:
-            symbol = stock['symbol']
-            if symbol not in unique_stocks:
-                unique_stocks[symbol] = stock
+        # Remove duplicates (reversed so the first source to report a symbol wins)
+        unique_stocks = {stock['symbol']: stock for stock in reversed(all_stocks)}
         
         logger.info(f"🎯 Total unique NSE stocks found: {len(unique_stocks)}")
         return list(unique_stocks.values())
@@ -164,113 +200,179 @@ class ComprehensiveIndianStockFetcher:
             logger.info("📊 Trying BSE endpoints...")
             
             # Popular BSE stocks that are also on NSE but with .BO suffix
-            popular_bse = [
-                'RELIANCE.BO', 'TCS.BO', 'HDFCBANK.BO', 'INFY.BO', 'HINDUNILVR.BO',
-                'ICICIBANK.BO', 'KOTAKBANK.BO', 'BHARTIARTL.BO', 'ITC.BO', 'SBIN.BO',
-                'BAJFINANCE.BO', 'ASIANPAINT.BO', 'MARUTI.BO', 'AXISBANK.BO', 'LT.BO'
-            ]
-            
-            for symbol in popular_bse:
-                bse_stocks.append({
-                    'symbol': symbol.replace('.BO', ''),
-                    'name': symbol.replace('.BO', ''),
-                    'exchange': 'BSE',
-                    'sector': 'Unknown'
-                })
+            bse_stocks = [dict(stock) for stock in POPULAR_BSE_STOCKS]
             
-            logger.info(f"✅ Added {len(popular_bse)} BSE stocks")
+            logger.info(f"✅ Added {len(bse_stocks)} BSE stocks")
             
         except Exception as e:
             logger.warning(f"BSE fetch failed: {e}")
         
         return bse_stocks
     
-    async def enrich_with_yfinance(self, stocks: List[Dict], batch_size: int = 30) -> List[Dict]:
+    def download_closes(self, yahoo_symbols: List[str]) -> Dict[str, float]:
+        """
+        Download the latest close for many Yahoo symbols in one request
+        Symbols Yahoo has no price for are left out of the result
+        """
+        try:
+            with YF_DOWNLOAD_LOCK:
+                data = yf.download(
+                    tickers=yahoo_symbols,
+                    period="2d",
+                    interval="1d",
+                    group_by="ticker",
+                    auto_adjust=True,
+                    threads=True,
+                    progress=False
+                )
+        except Exception as e:
+            logger.warning(f"yfinance download failed for {len(yahoo_symbols)} symbols: {e}")
+            return {}
+        
+        if data.empty:
+            return {}
+        
+        # Older yfinance versions return flat columns for a single ticker
+        if not isinstance(data.columns, pd.MultiIndex):
+            data = pd.concat({yahoo_symbols[0]: data}, axis=1)
+        
+        closes = data.xs('Close', axis=1, level=1).ffill().iloc[-1]
+        return {symbol: float(price) for symbol, price in closes.items() if not pd.isna(price)}
+    
+    async def enrich_batch(self, stocks: List[Dict]) -> List[Dict]:
+        """
+        Enrich a batch of stocks with one multi-symbol yfinance download
+        Symbols missing on NSE are retried together on BSE; stocks with no
+        price on either keep their basic info (marked 'failed')
+        """
+        await yahoo_limiter.acquire()
+        nse_closes = await asyncio.to_thread(
+            self.download_closes, [f"{stock['symbol']}.NS" for stock in stocks]
+        )
+        
+        missing = [stock for stock in stocks if f"{stock['symbol']}.NS" not in nse_closes]
+        bse_closes = {}
+        if missing:
+            await yahoo_limiter.acquire()
+            bse_closes = await asyncio.to_thread(
+                self.download_closes, [f"{stock['symbol']}.BO" for stock in missing]
+            )
+        
+        enriched = []
+        for stock in stocks:
+            symbol = stock['symbol']
+            enriched_stock = {
+                'symbol': symbol,
+                'name': stock['name'],
+                'exchange': stock['exchange'],
+                'sector': stock.get('sector', 'Unknown'),
+                'current_price': 100.0,
+                'is_active': True
+            }
+            if f"{symbol}.NS" in nse_closes:
+                enriched_stock['current_price'] = nse_closes[f"{symbol}.NS"]
+            elif f"{symbol}.BO" in bse_closes:
+                enriched_stock['current_price'] = bse_closes[f"{symbol}.BO"]
+                enriched_stock['exchange'] = 'BSE'
+            else:
+                enriched_stock['failed'] = True
+            enriched.append(enriched_stock)
+        return enriched
+    
+    async def enrich_with_yfinance(self, stocks: List[Dict], batch_size: int = 30,
+                                   concurrency: int = 1) -> AsyncIterator[List[Dict]]:
         """
-        Enrich stock data with yfinance for real prices and company info
+        Enrich stock data with yfinance prices, `batch_size` symbols per download
+        Up to `concurrency` downloads run at once, paced by the shared Yahoo
+        rate limiter; each enriched batch is yielded as soon as it completes
         """
-        logger.info(f"💰 Enriching {len(stocks)} stocks with yfinance data...")
+        logger.info(f"💰 Enriching {len(stocks)} stocks with yfinance data "
+                    f"(batch_size={batch_size}, concurrency={concurrency})...")
+        
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def enrich(batch: List[Dict]) -> List[Dict]:
+            async with semaphore:
+                return await self.enrich_batch(batch)
         
-        enriched_stocks = []
-        failed_count = 0
+        tasks = [
+            asyncio.create_task(enrich(stocks[i:i + batch_size]))
+            for i in range(0, len(stocks), batch_size)
+        ]
+        try:
+            for next_batch in asyncio.as_completed(tasks):
+                yield await next_batch
+        finally:
+            # Stop outstanding downloads if the caller is cancelled or times out
+            for task in tasks:
+                task.cancel()
+    
+    def upsert_stocks(self, db: Session, rows: List[Dict]) -> int:
+        """
+        Upsert stock rows with chunked INSERT ... ON CONFLICT (symbol) DO UPDATE
+        Returns how many of the rows already existed
+        """
+        dialect = db.get_bind().dialect.name
+        if dialect not in UPSERT_INSERTS:
+            raise NotImplementedError(f"Stock upsert is not supported on {dialect}")
+        insert = UPSERT_INSERTS[dialect]
         
-        for i in range(0, len(stocks), batch_size):
-            batch = stocks[i:i + batch_size]
-            logger.info(f"Processing batch {i//batch_size + 1}/{(len(stocks) + batch_size - 1)//batch_size}")
+        existing_total = 0
+        chunk_size = upsert_chunk_size(dialect, len(rows[0]) if rows else 1)
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
             
-            for stock in batch:
-                try:
-                    symbol = stock['symbol']
-                    yahoo_symbol = f"{symbol}.NS"  # Try NSE first
-                    
-                    ticker = yf.Ticker(yahoo_symbol)
-                    info = ticker.info
-                    
-                    # Try to get recent price
-                    hist = ticker.history(period="2d")
-                    current_price = float(hist['Close'].iloc[-1]) if not hist.empty else info.get('currentPrice', 100.0)
-                    
-                    enriched_stock = {
-                        'symbol': symbol,
-                        'name': info.get('longName', info.get('shortName', stock['name'])),
-                        'exchange': stock['exchange'],
-                        'sector': info.get('sector', 'Unknown'),
-                        'current_price': current_price,
-                        'market_cap': info.get('marketCap'),
-                        'is_active': True
-                    }
-                    
-                    enriched_stocks.append(enriched_stock)
-                    
-                except Exception as e:
-                    # If NSE fails, try BSE
-                    try:
-                        yahoo_symbol = f"{symbol}.BO"
-                        ticker = yf.Ticker(yahoo_symbol)
-                        info = ticker.info
-                        
-                        hist = ticker.history(period="2d")
-                        current_price = float(hist['Close'].iloc[-1]) if not hist.empty else 100.0
-                        
-                        enriched_stock = {
-                            'symbol': symbol,
-                            'name': info.get('longName', info.get('shortName', stock['name'])),
-                            'exchange': 'BSE',
-                            'sector': info.get('sector', 'Unknown'),
-                            'current_price': current_price,
-                            'market_cap': info.get('marketCap'),
-                            'is_active': True
-                        }
-                        
-                        enriched_stocks.append(enriched_stock)
-                        
-                    except Exception as e2:
-                        # Add stock with basic info if both fail
-                        failed_count += 1
-                        enriched_stocks.append({
-                            'symbol': symbol,
-                            'name': stock['name'],
-                            'exchange': stock['exchange'],
-                            'sector': 'Unknown',
-                            'current_price': 100.0,
-                            'is_active': True
-                        })
+            # Only used to report how many rows were added vs updated
+            existing_total += db.scalar(
+                select(func.count())
+                .select_from(Stock)
+                .where(Stock.symbol.in_([row['symbol'] for row in chunk]))
+            )
             
-            # Rate limiting
-            await asyncio.sleep(2)
-        
-        logger.info(f"✅ Enriched {len(enriched_stocks)} stocks, {failed_count} failed to get price data")
-        return enriched_stocks
+            # Sector is only known from the source lists, so keep any stored value
+            stmt = insert(Stock).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Stock.symbol],
+                set_={
+                    'name': stmt.excluded.name,
+                    'current_price': stmt.excluded.current_price,
+                    'previous_close': stmt.excluded.previous_close,
+                    'exchange': stmt.excluded.exchange,
+                },
+            )
+            db.execute(stmt)
+        return existing_total
     
-    async def populate_comprehensive_database(self, force_refresh: bool = False) -> int:
+    def save_batch(self, rows: List[Dict]) -> int:
+        """
+        Upsert and commit one batch in its own session, for use from a worker thread
+        Returns how many of the rows already existed
+        """
+        with SessionLocal() as db:
+            existing_count = self.upsert_stocks(db, rows)
+            db.commit()
+            return existing_count
+    
+    def count_stocks(self) -> int:
+        """
+        Count the stocks table in its own session, for use from a worker thread
+        """
+        with SessionLocal() as db:
+            return db.query(Stock).count()
+    
+    async def populate_comprehensive_database(self, force_refresh: bool = False,
+                                              batch_size: int = 30, concurrency: int = 1) -> int:
         """
         Populate database with ALL Indian stocks
+        Each enriched batch is committed as it completes, so a timeout keeps
+        the batches that were already saved. Database work runs in worker
+        threads so the event loop keeps serving requests
         """
-        db = SessionLocal()
+        saved_count = 0
         
         try:
             if not force_refresh:
-                existing_count = db.query(Stock).count()
+                existing_count = await asyncio.to_thread(self.count_stocks)
                 if existing_count > 1000:  # Only skip if we have a truly comprehensive database
                     logger.info(f"Database already has {existing_count} stocks. Use force_refresh=True to update.")
                     return existing_count
@@ -287,69 +389,49 @@ class ComprehensiveIndianStockFetcher:
             bse_stocks = await self.fetch_all_bse_stocks()
             logger.info(f"📊 BSE: Found {len(bse_stocks)} stocks")
             
-            # Step 3: Combine and deduplicate
-            all_stocks = nse_stocks + bse_stocks
-            unique_stocks = {}
-            for stock in all_stocks:
-                symbol = stock['symbol']
-                if symbol not in unique_stocks:
-                    unique_stocks[symbol] = stock
+            # Step 3: Combine and deduplicate (NSE written last so it wins over BSE)
+            unique_stocks = {stock['symbol']: stock for stock in reversed(bse_stocks)}
+            unique_stocks.update((stock['symbol'], stock) for stock in reversed(nse_stocks))
             
             logger.info(f"📋 Total unique stocks before enrichment: {len(unique_stocks)}")
             
-            # Step 4: Enrich with yfinance data
-            enriched_stocks = await self.enrich_with_yfinance(list(unique_stocks.values()))
-            
-            # Step 5: Save to database
+            # Step 4: Enrich with yfinance data and save each batch as it arrives
             inserted_count = 0
             updated_count = 0
+            failed_count = 0
             
-            logger.info("💾 Saving to database...")
-            
-            for stock_data in enriched_stocks:
-                try:
-                    existing_stock = db.query(Stock).filter(Stock.symbol == stock_data['symbol']).first()
-                    
-                    if existing_stock:
-                        # Update existing
-                        existing_stock.name = stock_data['name']
-                        existing_stock.current_price = stock_data['current_price']
-                        existing_stock.previous_close = stock_data['current_price']
-                        existing_stock.sector = stock_data['sector']
-                        existing_stock.exchange = stock_data['exchange']
-                        updated_count += 1
-                    else:
-                        # Create new
-                        new_stock = Stock(
-                            symbol=stock_data['symbol'],
-                            name=stock_data['name'],
-                            current_price=stock_data['current_price'],
-                            previous_close=stock_data['current_price'],
-                            exchange=stock_data['exchange'],
-                            sector=stock_data['sector'],
-                            is_active=True
-                        )
-                        db.add(new_stock)
-                        inserted_count += 1
+            enriched_batches = self.enrich_with_yfinance(
+                list(unique_stocks.values()), batch_size=batch_size, concurrency=concurrency
+            )
+            async with aclosing(enriched_batches):
+                async for enriched_batch in enriched_batches:
+                    failed_count += sum(1 for stock in enriched_batch if stock.pop('failed', False))
+                    rows = [
+                        {
+                            'symbol': stock_data['symbol'],
+                            'name': stock_data['name'],
+                            'current_price': stock_data['current_price'],
+                            'previous_close': stock_data['current_price'],
+                            'exchange': stock_data['exchange'],
+                            'sector': stock_data['sector'],
+                            'is_active': True,
+                        }
+                        for stock_data in enriched_batch
+                    ]
                     
-                    # Commit in batches
-                    if (inserted_count + updated_count) % 100 == 0:
-                        db.commit()
-                        logger.info(f"💾 Processed {inserted_count + updated_count} stocks...")
-                        
-                except Exception as e:
-                    logger.error(f"Error saving {stock_data['symbol']}: {e}")
-                    db.rollback()
-                    continue
+                    existing_count = await asyncio.to_thread(self.save_batch, rows)
+                    inserted_count += len(rows) - existing_count
+                    updated_count += existing_count
+                    saved_count += len(rows)
+                    logger.info(f"💾 Saved {saved_count}/{len(unique_stocks)} stocks...")
             
-            # Final commit
-            db.commit()
-            total_stocks = db.query(Stock).count()
+            total_stocks = await asyncio.to_thread(self.count_stocks)
             end_time = time.time()
             
             logger.info("🎉 COMPREHENSIVE stock population completed!")
             logger.info(f"📈 New stocks added: {inserted_count}")
             logger.info(f"🔄 Existing stocks updated: {updated_count}")
+            logger.info(f"⚠️  Stocks without price data: {failed_count}")
             logger.info(f"🎯 Total stocks in database: {total_stocks}")
             logger.info(f"⏱️  Total time: {end_time - start_time:.2f} seconds")
             
@@ -357,19 +439,23 @@ class ComprehensiveIndianStockFetcher:
             
         except Exception as e:
             logger.error(f"Comprehensive population failed: {e}")
-            db.rollback()
             return 0
         finally:
-            db.close()
+            # Runs on timeout too, so partially saved batches are not served stale
+            if saved_count:
+                await asyncio.to_thread(cache.delete_prefix, "stocks:")
 
 # Global instance
 comprehensive_fetcher = ComprehensiveIndianStockFetcher()
 
-async def populate_all_indian_stocks(force_refresh: bool = False):
+async def populate_all_indian_stocks(force_refresh: bool = False, batch_size: int = 30,
+                                     concurrency: int = 1):
     """
     Populate database with ALL Indian stocks
     """
-    return await comprehensive_fetcher.populate_comprehensive_database(force_refresh)
+    return await comprehensive_fetcher.populate_comprehensive_database(
+        force_refresh, batch_size=batch_size, concurrency=concurrency
+    )
 
 # Export for main app
 __all__ = ['comprehensive_fetcher', 'populate_all_indian_stocks', 'ComprehensiveIndianStockFetcher']
@@ -15,39 +15,46 @@ import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
-import requests
+import httpx
+import numpy as np
+import orjson
+import pandas as pd
 import yfinance as yf
 from fastapi import BackgroundTasks, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy import case, or_, func, select
 import time
 
-try:
-    from apscheduler.schedulers.asyncio import AsyncIOScheduler
-    SCHEDULER_AVAILABLE = True
-except ImportError:
-    SCHEDULER_AVAILABLE = False
-    AsyncIOScheduler = None
-
+from app.core import cache
 from app.core.database import SessionLocal
 from app.models.models import Stock
+from app.services.comprehensive_indian_stocks import comprehensive_fetcher
+from app.services.real_time_fetcher import nse_limiter, yahoo_limiter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Rows per batched INSERT/UPDATE when populating
+BULK_CHUNK_SIZE = 500
+
+# Held for the whole update window (not released) so workers whose daily
+# timer fires a little later do not repeat the run
+DAILY_UPDATE_LOCK_KEY = "lock:daily_stock_update"
+DAILY_UPDATE_LOCK_TTL = 3600  # seconds
+DAILY_UPDATE_HOUR = 1  # local time
+
+# Stats snapshot, rebuilt after every population run. Lives under the
+# "stocks:" prefix so other populators' cache invalidation also drops it.
+STATS_CACHE_KEY = "stocks:stats"
+STATS_CACHE_TTL = 86400  # seconds
+
 class EnhancedStockDataFetcher:
     """Enhanced stock data fetcher using multiple free sources"""
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-        })
+    def get_http_client(self) -> httpx.AsyncClient:
+        """Outbound calls share the app-wide pooled client (closed on shutdown)"""
+        return comprehensive_fetcher.get_http_client()
     
     async def fetch_nse_api_stocks(self) -> List[Dict[str, Any]]:
         """Fetch stocks from NSE public API (following your approach)"""
@@ -67,9 +74,10 @@ class EnhancedStockDataFetcher:
                     url = f'https://www.nseindia.com/api/equity-stockIndices?index={index}'
                     logger.info(f"Fetching from NSE: {index.replace('%20', ' ')}")
                     
-                    response = self.session.get(url, timeout=30)
+                    await nse_limiter.acquire()
+                    response = await self.get_http_client().get(url)
                     if response.status_code == 200:
-                        data = response.json()
+                        data = orjson.loads(response.content)
                         
                         for stock in data.get('data', []):
                             all_stocks.append({
@@ -81,17 +89,12 @@ class EnhancedStockDataFetcher:
                                 'sector': 'Unknown'  # NSE API doesn't provide sector
                             })
                     
-                    # Rate limiting
-                    await asyncio.sleep(1)
-                    
                 except Exception as e:
                     logger.warning(f"Error fetching NSE index {index}: {e}")
                     continue
             
             # Remove duplicates
-            unique_stocks = {}
-            for stock in all_stocks:
-                unique_stocks[stock['symbol']] = stock
+            unique_stocks = {stock['symbol']: stock for stock in all_stocks}
             
             logger.info(f"Fetched {len(unique_stocks)} unique stocks from NSE API")
             return list(unique_stocks.values())
@@ -100,6 +103,11 @@ class EnhancedStockDataFetcher:
             logger.error(f"Error in NSE API fetch: {e}")
             return []
     
+    async def fetch_ticker_info(self, yahoo_symbol: str) -> Dict[str, Any]:
+        """Fetch yfinance ticker info on a worker thread, within the Yahoo rate limit"""
+        await yahoo_limiter.acquire()
+        return await asyncio.to_thread(lambda: yf.Ticker(yahoo_symbol).info)
+    
     async def fetch_yahoo_finance_batch(self, symbols: List[str]) -> List[Dict[str, Any]]:
         """Fetch stock data using yfinance (following your batch approach)"""
         try:
@@ -111,25 +119,37 @@ class EnhancedStockDataFetcher:
                 yahoo_symbols = [f"{symbol}.NS" for symbol in batch]
                 
                 try:
-                    # Use yfinance to get detailed data
-                    data = yf.download(yahoo_symbols, period="2d", progress=False)
+                    # Use yfinance to get detailed data (blocking, so off the event loop)
+                    await yahoo_limiter.acquire()
+                    data = await asyncio.to_thread(yf.download, yahoo_symbols, period="2d", progress=False)
                     
                     if not data.empty:
+                        # Extract the Close prices once per batch so each symbol
+                        # is a plain numpy lookup instead of MultiIndex indexing
+                        close_df = data['Close']
+                        if isinstance(close_df, pd.Series):
+                            close_df = close_df.to_frame(name=yahoo_symbols[0])
+                        close_arr = close_df.to_numpy(dtype=float)
+                        col_idx = {ticker_symbol: k for k, ticker_symbol in enumerate(close_df.columns)}
+                        
+                        # Get ticker info for additional details, concurrently
+                        infos = await asyncio.gather(
+                            *(self.fetch_ticker_info(yahoo_symbol) for yahoo_symbol in yahoo_symbols),
+                            return_exceptions=True
+                        )
+                        
                         for j, symbol in enumerate(batch):
                             yahoo_symbol = yahoo_symbols[j]
                             
                             try:
-                                # Get ticker info for additional details
-                                ticker = yf.Ticker(yahoo_symbol)
-                                info = ticker.info
+                                info = infos[j]
+                                if isinstance(info, Exception):
+                                    raise info
                                 
                                 # Get price data
-                                if len(batch) == 1:
-                                    close_data = data['Close'] if 'Close' in data.columns else data
-                                else:
-                                    close_data = data[yahoo_symbol]['Close'] if yahoo_symbol in data.columns.levels[0] else None
-                                
-                                current_price = float(close_data.iloc[-1]) if close_data is not None and not close_data.empty else info.get('currentPrice', 0)
+                                k = col_idx.get(yahoo_symbol)
+                                last_close = close_arr[-1, k] if k is not None else np.nan
+                                current_price = float(last_close) if not np.isnan(last_close) else info.get('currentPrice', 0)
                                 
                                 stocks.append({
                                     'symbol': symbol,
@@ -150,9 +170,6 @@ class EnhancedStockDataFetcher:
                                     'sector': 'Unknown'
                                 })
                     
-                    # Rate limiting to be respectful
-                    await asyncio.sleep(2)
-                    
                 except Exception as e:
                     logger.error(f"Error fetching batch {batch}: {e}")
                     continue
@@ -205,7 +222,7 @@ class EnhancedStockService:
     
     def __init__(self):
         self.fetcher = EnhancedStockDataFetcher()
-        self.scheduler = None
+        self.scheduler_task: Optional[asyncio.Task] = None
     
     async def populate_database_comprehensive(self, db: Session, force_refresh: bool = False) -> int:
         """
@@ -253,52 +270,64 @@ class EnhancedStockService:
         
         logger.info(f"📋 Processing {len(unique_stocks)} unique stocks for database...")
         
-        # Insert/update in database
+        # Insert/update in database: one symbol -> id lookup per chunk,
+        # then batched INSERT and UPDATE statements instead of per-row ORM work
         inserted_count = 0
         updated_count = 0
         
-        for symbol, stock_data in unique_stocks.items():
+        symbols = list(unique_stocks)
+        for i in range(0, len(symbols), BULK_CHUNK_SIZE):
+            chunk = symbols[i:i + BULK_CHUNK_SIZE]
             try:
-                existing_stock = db.query(Stock).filter(Stock.symbol == symbol).first()
+                existing_ids = dict(
+                    db.execute(select(Stock.symbol, Stock.id).where(Stock.symbol.in_(chunk))).all()
+                )
                 
-                if existing_stock:
-                    # Update existing stock
-                    if stock_data.get('name'):
-                        existing_stock.name = stock_data['name']
-                    if stock_data.get('last_price'):
-                        existing_stock.current_price = stock_data['last_price']
-                        existing_stock.previous_close = existing_stock.current_price
-                    if stock_data.get('sector'):
-                        existing_stock.sector = stock_data['sector']
-                    
-                    updated_count += 1
-                else:
-                    # Create new stock
-                    new_stock = Stock(
-                        symbol=symbol,
-                        name=stock_data.get('name', symbol),
-                        current_price=stock_data.get('last_price', 100.0),
-                        previous_close=stock_data.get('last_price', 100.0),
-                        exchange=stock_data.get('exchange', 'NSE'),
-                        sector=stock_data.get('sector', 'Unknown'),
-                        is_active=True
-                    )
-                    db.add(new_stock)
-                    inserted_count += 1
+                new_rows = []
+                update_rows = []
+                for symbol in chunk:
+                    stock_data = unique_stocks[symbol]
+                    if symbol in existing_ids:
+                        # Only overwrite the fields the sources actually returned
+                        row = {'id': existing_ids[symbol]}
+                        if stock_data.get('name'):
+                            row['name'] = stock_data['name']
+                        if stock_data.get('last_price'):
+                            row['current_price'] = stock_data['last_price']
+                            row['previous_close'] = stock_data['last_price']
+                        if stock_data.get('sector'):
+                            row['sector'] = stock_data['sector']
+                        update_rows.append(row)
+                    else:
+                        new_rows.append({
+                            'symbol': symbol,
+                            'name': stock_data.get('name', symbol),
+                            'current_price': stock_data.get('last_price', 100.0),
+                            'previous_close': stock_data.get('last_price', 100.0),
+                            'exchange': stock_data.get('exchange', 'NSE'),
+                            'sector': stock_data.get('sector', 'Unknown'),
+                            'is_active': True
+                        })
+                
+                if new_rows:
+                    db.bulk_insert_mappings(Stock, new_rows)
+                if update_rows:
+                    db.bulk_update_mappings(Stock, update_rows)
+                db.commit()
                 
-                # Commit in batches
-                if (inserted_count + updated_count) % 100 == 0:
-                    db.commit()
-                    logger.info(f"Processed {inserted_count + updated_count} stocks...")
+                inserted_count += len(new_rows)
+                updated_count += len(update_rows)
+                logger.info(f"Processed {inserted_count + updated_count} stocks...")
                 
             except Exception as e:
-                logger.error(f"Error processing stock {symbol}: {e}")
+                logger.error(f"Error processing stocks {chunk[0]}..{chunk[-1]}: {e}")
                 db.rollback()
                 continue
         
         # Final commit
         try:
             db.commit()
+            cache.delete_prefix("stocks:")
             total_stocks = db.query(Stock).count()
             end_time = time.time()
             
@@ -308,6 +337,7 @@ class EnhancedStockService:
             logger.info(f"🎯 Total stocks in database: {total_stocks}")
             logger.info(f"⏱️  Total time: {end_time - start_time:.2f} seconds")
             
+            self.refresh_stats_cache(db)
             return total_stocks
             
         except Exception as e:
@@ -329,25 +359,36 @@ class EnhancedStockService:
             Stock.sector.ilike(f"%{query}%")
         )
         
-        # Get total count
-        total = db.query(Stock).filter(search_filter, Stock.is_active == True).count()
+        # Get the page and the total match count in one query via a window count,
+        # selecting only the returned columns instead of hydrating Stock objects
+        rows = db.execute(
+            select(
+                Stock.symbol,
+                Stock.name,
+                Stock.exchange,
+                Stock.sector,
+                Stock.current_price,
+                Stock.is_active,
+                func.count().over().label('total')
+            )
+            .where(search_filter, Stock.is_active == True)
+            .order_by(Stock.symbol)
+            .offset(offset)
+            .limit(per_page)
+        ).mappings().all()
         
-        # Get paginated results with ordering
-        stocks = db.query(Stock).filter(search_filter, Stock.is_active == True)\
-                   .order_by(Stock.symbol)\
-                   .offset(offset).limit(per_page).all()
+        if rows:
+            total = rows[0]['total']
+        elif offset:
+            # Past the last page the window count is unavailable
+            total = db.scalar(select(func.count()).where(search_filter, Stock.is_active == True))
+        else:
+            total = 0
         
         return {
             "stocks": [
-                {
-                    "symbol": stock.symbol,
-                    "name": stock.name,
-                    "exchange": stock.exchange,
-                    "sector": stock.sector,
-                    "current_price": stock.current_price,
-                    "is_active": stock.is_active
-                }
-                for stock in stocks
+                {key: value for key, value in row.items() if key != 'total'}
+                for row in rows
             ],
             "total": total,
             "page": page,
@@ -356,10 +397,34 @@ class EnhancedStockService:
         }
     
     def get_database_stats(self, db: Session) -> Dict[str, Any]:
+        """Get database statistics from the cached snapshot, computing it on a miss"""
+        cached = cache.get_value(STATS_CACHE_KEY)
+        if cached is not None:
+            return cached
+        return self.refresh_stats_cache(db)
+    
+    def refresh_stats_cache(self, db: Session) -> Dict[str, Any]:
+        """Recompute database statistics and store the snapshot"""
+        stats = self.compute_database_stats(db)
+        if "error" not in stats:
+            cache.set_value(STATS_CACHE_KEY, stats, STATS_CACHE_TTL)
+        return stats
+    
+    def compute_database_stats(self, db: Session) -> Dict[str, Any]:
         """Get comprehensive database statistics"""
         try:
-            total_stocks = db.query(Stock).count()
-            active_stocks = db.query(Stock).filter(Stock.is_active == True).count()
+            # Totals and price statistics in a single scan
+            totals = db.execute(
+                select(
+                    func.count(Stock.id).label('total'),
+                    func.coalesce(func.sum(case((Stock.is_active == True, 1), else_=0)), 0).label('active'),
+                    func.min(Stock.current_price).label('min_price'),
+                    func.max(Stock.current_price).label('max_price'),
+                    func.avg(Stock.current_price).label('avg_price')
+                )
+            ).one()
+            total_stocks = totals.total
+            active_stocks = totals.active
             
             # Exchange breakdown
             exchange_stats = db.query(Stock.exchange, func.count(Stock.id)).group_by(Stock.exchange).all()
@@ -370,22 +435,15 @@ class EnhancedStockService:
                             .order_by(func.count(Stock.id).desc())\
                             .limit(10).all()
             
-            # Price statistics
-            price_stats = db.query(
-                func.min(Stock.current_price),
-                func.max(Stock.current_price),
-                func.avg(Stock.current_price)
-            ).first()
-            
             return {
                 "total_stocks": total_stocks,
                 "active_stocks": active_stocks,
                 "exchanges": {exchange: count for exchange, count in exchange_stats},
                 "top_sectors": {sector or "Unknown": count for sector, count in sector_stats},
                 "price_range": {
-                    "min": float(price_stats[0]) if price_stats[0] else 0,
-                    "max": float(price_stats[1]) if price_stats[1] else 0,
-                    "average": float(price_stats[2]) if price_stats[2] else 0
+                    "min": float(totals.min_price) if totals.min_price else 0,
+                    "max": float(totals.max_price) if totals.max_price else 0,
+                    "average": float(totals.avg_price) if totals.avg_price else 0
                 },
                 "last_updated": datetime.now().isoformat(),
                 "status": "healthy" if total_stocks > 100 else "needs_update"
@@ -396,32 +454,33 @@ class EnhancedStockService:
             return {"error": str(e)}
     
     def setup_scheduler(self):
-        """Setup background scheduler for daily updates"""
-        if not SCHEDULER_AVAILABLE:
-            logger.warning("⚠️  APScheduler not available - daily updates disabled")
-            return
-            
-        if self.scheduler is None:
-            self.scheduler = AsyncIOScheduler()
-            
-            # Daily update at 1 AM
-            self.scheduler.add_job(
-                self.daily_stock_update,
-                'cron',
-                hour=1,
-                minute=0,
-                id='daily_stock_update'
-            )
-            
-            self.scheduler.start()
+        """Start the background task for daily updates"""
+        if self.scheduler_task is None or self.scheduler_task.done():
+            self.scheduler_task = asyncio.create_task(self.run_daily_updates())
             logger.info("📅 Background scheduler started for daily updates")
     
+    @staticmethod
+    def seconds_until_daily_update() -> float:
+        """Seconds until the next DAILY_UPDATE_HOUR:00"""
+        now = datetime.now()
+        next_run = now.replace(hour=DAILY_UPDATE_HOUR, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+    
+    async def run_daily_updates(self):
+        """Sleep until the daily update time, run the update, repeat"""
+        while True:
+            await asyncio.sleep(self.seconds_until_daily_update())
+            await self.daily_stock_update()
+    
     async def daily_stock_update(self):
         """Background task for daily stock updates"""
-        if not SCHEDULER_AVAILABLE:
-            logger.warning("⚠️  Scheduler not available for daily updates")
+        # Only one worker process runs the update
+        if not cache.acquire_lock(DAILY_UPDATE_LOCK_KEY, DAILY_UPDATE_LOCK_TTL):
+            logger.info("⏭️  Daily stock update already running in another worker, skipping")
             return
-            
+        
         logger.info("🌅 Starting daily stock update...")
         
         db = SessionLocal()
@@ -20,6 +20,7 @@ class PriceUpdateScheduler:
     def __init__(self):
         self.is_running = False
         self.update_task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
         self.last_update_time: Optional[datetime] = None
         self.update_count = 0
         self.error_count = 0
@@ -103,7 +104,7 @@ class PriceUpdateScheduler:
                 logger.warning("Multiple update errors detected, slowing down updates")
                 await asyncio.sleep(60)  # Wait 1 minute after errors
     
-    def _get_update_interval(self) -> int:
+    def get_update_interval(self) -> int:
         """Get the appropriate update interval based on market status"""
         market_session = market_timer.get_market_session()
         
@@ -124,7 +125,7 @@ class PriceUpdateScheduler:
                 await self._single_update_cycle()
                 
                 # Calculate next update interval
-                interval = self._get_update_interval() 
+                interval = self.get_update_interval() 
                 
                 # Reset error count on successful update
                 if self.error_count > 0:
@@ -160,6 +161,7 @@ class PriceUpdateScheduler:
         def run_async_loop():
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
+            self.loop = loop
             
             try:
                 self.update_task = loop.create_task(self._update_loop())
@@ -167,6 +169,7 @@ class PriceUpdateScheduler:
             except Exception as e:
                 logger.error(f"Error in async update loop: {e}")
             finally:
+                self.loop = None
                 loop.close()
         
         thread = threading.Thread(target=run_async_loop, daemon=True)
@@ -182,8 +185,10 @@ class PriceUpdateScheduler:
         
         self.is_running = False
         
-        if self.update_task and not self.update_task.done():
-            self.update_task.cancel()
+        # The task lives on the scheduler thread's loop, so cancel it from there
+        loop = self.loop
+        if loop is not None and self.update_task and not self.update_task.done():
+            loop.call_soon_threadsafe(self.update_task.cancel)
         
         logger.info("Price update scheduler stopped")
     
@@ -196,7 +201,7 @@ class PriceUpdateScheduler:
             "last_update": self.last_update_time.isoformat() if self.last_update_time else None,
             "total_updates": self.update_count,
             "error_count": self.error_count,
-            "update_interval": self._get_update_interval(),
+            "update_interval": self.get_update_interval(),
             "market_status": market_status
         }
 
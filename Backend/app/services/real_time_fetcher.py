@@ -2,6 +2,7 @@
 Real-time Indian Stock Price Fetcher with Rate Limiting
 """
 import asyncio
+import bisect
 import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
@@ -45,15 +46,17 @@ class RateLimiter:
         self.calls = [call_time for call_time in self.calls 
                      if now - call_time < self.time_window]
         
-        # If we're at the limit, wait
+        # Reserve a start slot before sleeping so concurrent callers
+        # queue up behind each other instead of all waking at once
+        start_time = now
         if len(self.calls) >= self.max_calls:
-            oldest_call = min(self.calls)
-            sleep_time = self.time_window - (now - oldest_call) + 0.1
-            if sleep_time > 0:
-                logger.info(f"Rate limit reached, sleeping for {sleep_time:.1f} seconds")
-                await asyncio.sleep(sleep_time)
+            start_time = max(now, self.calls[-self.max_calls] + self.time_window)
+        bisect.insort(self.calls, start_time)
         
-        self.calls.append(now)
+        sleep_time = start_time - now
+        if sleep_time > 0:
+            logger.debug(f"Rate limit reached, sleeping for {sleep_time:.1f} seconds")
+            await asyncio.sleep(sleep_time)
 
 class RealTimePriceFetcher:
     """Fetches real-time stock prices with rate limiting and error handling"""
@@ -146,61 +149,45 @@ class RealTimePriceFetcher:
                     
                     current_time = datetime.now()
                     
+                    # group_by="ticker" gives (ticker, field) columns; older yfinance
+                    # versions return flat columns for a single ticker, so normalize once
+                    if not isinstance(data.columns, pd.MultiIndex):
+                        data = pd.concat({batch_symbols[0]: data}, axis=1)
+                    
+                    # Pull the last two rows for every ticker at once: field -> {ticker: value}
+                    latest_rows = {}
+                    previous_closes = {}
+                    if not data.empty:
+                        for field in ('Close', 'Open', 'Volume'):
+                            field_df = data.xs(field, axis=1, level=1)
+                            latest_rows[field] = field_df.iloc[-1].to_dict()
+                            if field == 'Close' and len(field_df) >= 2:
+                                previous_closes = field_df.iloc[-2].to_dict()
+                    current_closes = latest_rows.get('Close', {})
+                    latest_opens = latest_rows.get('Open', {})
+                    latest_volumes = latest_rows.get('Volume', {})
+                    
                     for yahoo_symbol in batch_symbols:
                         original_symbol = symbol_mapping[yahoo_symbol]
                         
                         try:
-                            if len(batch_symbols) == 1:
-                                symbol_data = data
-                            else:
-                                symbol_data = data[yahoo_symbol] if yahoo_symbol in data.columns.get_level_values(0) else None
-                            
-                            if symbol_data is not None and not symbol_data.empty:
-                                # Get the latest data point
-                                latest_data = symbol_data.iloc[-1]
-                                
-                                # Handle multi-level columns for single symbol downloads
-                                def get_field_value(data_row, field_name):
-                                    """Helper to get field value from potentially multi-level columns"""
-                                    if len(batch_symbols) == 1:
-                                        # Single symbol download - multi-level columns
-                                        col_key = (yahoo_symbol, field_name)
-                                        if col_key in data_row.index:
-                                            return data_row[col_key]
-                                        # Fallback: try simple field name
-                                        if field_name in data_row.index:
-                                            return data_row[field_name]
-                                    else:
-                                        # Multi-symbol download - simple columns
-                                        if field_name in data_row.index:
-                                            return data_row[field_name]
-                                    return None
-                                
+                            if yahoo_symbol in current_closes:
                                 # Get current price
-                                close_value = get_field_value(latest_data, 'Close')
-                                if close_value is None or pd.isna(close_value):
+                                close_value = current_closes[yahoo_symbol]
+                                if pd.isna(close_value):
                                     logger.warning(f"No close price data for {yahoo_symbol}")
                                     continue
                                     
                                 current_price = float(close_value)
                                 
                                 # Get previous close price
-                                if len(symbol_data) >= 2:
+                                prev_close_value = previous_closes.get(yahoo_symbol)
+                                if prev_close_value is not None and not pd.isna(prev_close_value):
                                     # Use the previous day's close price
-                                    prev_data = symbol_data.iloc[-2]
-                                    prev_close_value = get_field_value(prev_data, 'Close')
-                                    if prev_close_value is not None and not pd.isna(prev_close_value):
-                                        previous_close = float(prev_close_value)
-                                    else:
-                                        # Fallback: use open price of current day
-                                        open_value = get_field_value(latest_data, 'Open')
-                                        if open_value is not None and not pd.isna(open_value):
-                                            previous_close = float(open_value)
-                                        else:
-                                            previous_close = current_price  # Last resort
+                                    previous_close = float(prev_close_value)
                                 else:
                                     # Fallback: use open price of current day
-                                    open_value = get_field_value(latest_data, 'Open')
+                                    open_value = latest_opens.get(yahoo_symbol)
                                     if open_value is not None and not pd.isna(open_value):
                                         previous_close = float(open_value)
                                     else:
@@ -210,7 +197,7 @@ class RealTimePriceFetcher:
                                 price_change = current_price - previous_close
                                 price_change_percent = (price_change / previous_close * 100) if previous_close != 0 else 0
                                 
-                                volume_value = get_field_value(latest_data, 'Volume')
+                                volume_value = latest_volumes.get(yahoo_symbol)
                                 volume = int(volume_value) if volume_value is not None and not pd.isna(volume_value) else None
                                 
                                 # Only use the first successful result for each original symbol
@@ -344,3 +331,7 @@ class RealTimePriceFetcher:
 
 # Global instance
 real_time_fetcher = RealTimePriceFetcher()
+
+# Process-wide limits per upstream host, shared by every fetcher
+nse_limiter = RateLimiter(max_calls=2, time_window=1)  # NSE blocks aggressive clients
+yahoo_limiter = RateLimiter(max_calls=5, time_window=1)
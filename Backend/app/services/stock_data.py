@@ -5,12 +5,14 @@ This example uses yfinance to get Indian stock data.
 Install with: pip install yfinance
 """
 
+import asyncio
 import yfinance as yf
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 
 from app.models.models import Stock
+from app.core import cache
 from app.core.config import settings
 
 # Configure logging
@@ -19,6 +21,10 @@ logger = logging.getLogger(__name__)
 # NSE stock symbols need to be suffixed with .NS for Yahoo Finance
 NSE_SUFFIX = ".NS" if settings.DEFAULT_EXCHANGE == "NSE" else ".BO"  # .BO for BSE
 
+# Yahoo Finance lookups made through get_multiple_stocks are memoized this long
+STOCK_DATA_CACHE_PREFIX = "stock_data:"
+STOCK_DATA_CACHE_TTL = 900  # seconds
+
 class StockDataService:
     """Service for fetching stock data from Yahoo Finance"""
     
@@ -95,11 +101,60 @@ class StockDataService:
         """
         results = []
         for symbol in symbols:
-            stock_data = StockDataService.get_stock_data(symbol)
+            stock_data = StockDataService.get_cached_stock_data(symbol)
             if stock_data:
                 results.append(stock_data)
         return results
     
+    @staticmethod
+    async def get_multiple_stocks_async(symbols: List[str], concurrency: int = 16) -> List[Dict[str, Any]]:
+        """
+        Get data for multiple stocks concurrently
+        
+        yfinance is blocking, so each lookup runs in a worker thread; at most
+        `concurrency` lookups are in flight at once.
+        
+        Args:
+            symbols: List of stock symbols (e.g., ["RELIANCE", "TCS"])
+            concurrency: Maximum number of simultaneous Yahoo Finance lookups
+            
+        Returns:
+            List of dictionaries with stock data, in the order of symbols
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def get_one(symbol: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await asyncio.to_thread(StockDataService.get_cached_stock_data, symbol)
+        
+        results = await asyncio.gather(*(get_one(symbol) for symbol in symbols))
+        return [stock_data for stock_data in results if stock_data]
+    
+    @staticmethod
+    def get_cached_stock_data(symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Get stock data for a single stock, reusing a recent Yahoo Finance result
+        
+        Results are cached for STOCK_DATA_CACHE_TTL seconds so reruns of the
+        seed and test scripts don't hit Yahoo again for the same symbols.
+        
+        Args:
+            symbol: Stock symbol (e.g., "RELIANCE")
+            
+        Returns:
+            Dictionary with stock data or None if failed
+        """
+        key = f"{STOCK_DATA_CACHE_PREFIX}{symbol}"
+        cached = cache.get_value(key)
+        if cached is not None:
+            return {**cached, "updated_at": datetime.fromisoformat(cached["updated_at"])}
+        
+        stock_data = StockDataService.get_stock_data(symbol)
+        if stock_data:
+            cache.set_value(key, {**stock_data, "updated_at": stock_data["updated_at"].isoformat()},
+                            STOCK_DATA_CACHE_TTL)
+        return stock_data
+    
     @staticmethod
     def update_stock_database(db_session, symbols: List[str]) -> None:
         """
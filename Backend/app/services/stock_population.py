@@ -11,20 +11,184 @@ This module creates a startup event that:
 
 import asyncio
 import logging
+import os
+import random
 import time
-from typing import List, Dict, Set
-import yfinance as yf
+from datetime import datetime, timedelta
+from typing import List, Dict, Set, FrozenSet
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
+from app.core import cache
 from app.core.database import SessionLocal
+from app.core.timezone_utils import get_ist_now
 from app.models.models import Stock
-from app.schemas.schemas import StockCreate
-from app.crud import stock as stock_crud
+from app.services.market_timing import market_timer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Yahoo quote cache (keyed by NSE symbol)
+QUOTE_CACHE_KEY = "yf:quote:{symbol}"
+QUOTE_CACHE_TTL_MARKET_OPEN = 300  # 5 minutes
+QUOTE_CACHE_TTL_MARKET_CLOSED = 60 * 60 * 24  # 24 hours
+
+# Failed stocks are retried this many times with exponential backoff
+FAILED_STOCK_RETRIES = 3
+RETRY_BACKOFF_MAX = 10  # seconds
+
+# Upserts are sent in chunks to stay under per-statement parameter limits
+UPSERT_CHUNK_SIZE = 500
+UPSERT_INSERTS = {
+    'postgresql': postgresql_insert,
+    'sqlite': sqlite_insert,
+}
+# SQLite builds before 3.32 allow at most 999 bound parameters per statement
+SQLITE_MAX_VARIABLES = 999
+
+# Skip population if the stock table was refreshed more recently than this
+# (set FORCE_STOCK_REPOPULATE=1 to always repopulate)
+STOCK_FRESHNESS_WINDOW = timedelta(hours=1)
+STOCK_CLOCK_SKEW_TOLERANCE = timedelta(minutes=5)
+# Completion time of the last population run (not under "stocks:", which is
+# dropped after every population)
+POPULATION_COMPLETED_KEY = "population:completed_at"
+
+# Comprehensive NSE stock symbols from major indices.
+# Several symbols appear under more than one category; the frozenset
+# deduplicates them once at import time.
+NSE_SYMBOLS: FrozenSet[str] = frozenset({
+    # NIFTY 50
+    "ADANIENT", "ADANIPORTS", "APOLLOHOSP", "ASIANPAINT", "AXISBANK",
+    "BAJAJ-AUTO", "BAJFINANCE", "BAJAJFINSV", "BPCL", "BHARTIARTL",
+    "BRITANNIA", "CIPLA", "COALINDIA", "DIVISLAB", "DRREDDY",
+    "EICHERMOT", "GRASIM", "HCLTECH", "HDFCBANK", "HDFCLIFE",
+    "HEROMOTOCO", "HINDALCO", "HINDUNILVR", "ICICIBANK", "ITC",
+    "INDUSINDBK", "INFY", "JSWSTEEL", "KOTAKBANK", "LT",
+    "M&M", "MARUTI", "NESTLEIND", "NTPC", "ONGC",
+    "POWERGRID", "RELIANCE", "SBILIFE", "SBIN", "SUNPHARMA",
+    "TCS", "TATACONSUM", "TATAMOTORS", "TATASTEEL", "TECHM",
+    "TITAN", "ULTRACEMCO", "UPL", "WIPRO",
+
+    # NIFTY NEXT 50
+    "ABB", "ACC", "ADANIGREEN", "ADANIPOWER", "AMBUJACEM",
+    "AUBANK", "AUROPHARMA", "BANDHANBNK", "BANKBARODA", "BATAINDIA",
+    "BEL", "BERGEPAINT", "BIOCON", "BOSCHLTD", "CANBK",
+    "CHOLAFIN", "COLPAL", "CONCOR", "CUMMINSIND", "DABUR",
+    "DEEPAKNTR", "DMART", "EXIDEIND", "FEDERALBNK", "GAIL",
+    "GODREJCP", "GODREJPROP", "HAVELLS", "HFCL", "IBULHSGFIN",
+    "ICICIPRULI", "IDEA", "IDFCFIRSTB", "IGL", "INDIGO",
+    "IOC", "IRCTC", "JINDALSTEL", "JUBLFOOD", "LICHSGFIN",
+    "LUPIN", "MARICO", "MCDOWELL-N", "MFSL", "MGL",
+    "MINDTREE", "MOTHERSUMI", "MPHASIS", "MRF", "MUTHOOTFIN",
+
+    # Banking Stocks
+    "YESBANK", "RBLBANK", "PNB", "UNIONBANK", "CENTRALBK",
+    "INDIANB", "IDFCFIRSTB", "EQUITAS", "UJJIVAN", "SURYODAY",
+    "ESAFSFB", "FINPIPE", "CAPITALFIRST", "DCBBANK", "SOUTHBANK",
+    "ORIENTBANK", "CORPBANK", "SYNDIBANK", "VIJAYABANK", "DENABANK",
+
+    # IT Stocks
+    "LTIM", "PERSISTENT", "COFORGE", "MINDTREE", "MPHASIS",
+    "LTTS", "CYIENT", "HEXAWARE", "ZENSAR", "NIITTECH",
+    "KPITTECH", "RAMSARUP", "SONATSOFTW", "NELCO", "SAKSOFT",
+    "TATAELXSI", "HAPPSTMNDS", "ROUTE", "INTELLECT", "SUBEX",
+
+    # Pharmaceutical Stocks
+    "GLENMARK", "CADILAHC", "TORNTPHARM", "ALKEM", "IPCALAB",
+    "GRANULES", "LAURUSLABS", "DIVIS", "LALPATHLAB", "METROPOLIS",
+    "THYROCARE", "KRSNAA", "VIJAYA", "SOLARA", "STRIDES",
+    "BLISSGVS", "PFIZER", "SANOFI", "GLAXO", "NOVARTIS",
+
+    # Auto Stocks
+    "TVSMOTOR", "BAJAJ-AUTO", "HEROMOTOCO", "EICHERMOT", "MARUTI",
+    "TATAMOTORS", "M&M", "ASHOKLEY", "FORCEMOT", "ESCORTS",
+    "APOLLOTYRE", "MRF", "CEAT", "JK", "BALKRISIND",
+    "MOTHERSUMI", "BOSCHLTD", "WABCOINDIA", "ENDURANCE", "SUPRAJIT",
+
+    # FMCG Stocks
+    "HINDUNILVR", "ITC", "NESTLEIND", "BRITANNIA", "DABUR",
+    "GODREJCP", "MARICO", "COLPAL", "EMAMILTD", "GILLETTE",
+    "VBL", "RADICO", "MCDOWELL-N", "CCL", "BAJAJCON",
+    "PATANJALI", "JYOTHYLAB", "HONASA", "NYKAA", "KALYANI",
+
+    # Cement Stocks
+    "ULTRACEMCO", "ACC", "AMBUJACEM", "SHREECEM", "DALMIACMT",
+    "RAMCOCEM", "HEIDELBERG", "JKCEMENT", "ORIENTCEM", "PRISM",
+    "BIRLACEM", "KESORAMIND", "SANGHINDIA", "MAGMA", "BURNPUR",
+
+    # Steel & Metals
+    "TATASTEEL", "JSWSTEEL", "HINDALCO", "JINDALSTEL", "SAIL",
+    "NMDC", "COALINDIA", "VEDL", "HINDZINC", "NATIONALUM",
+    "RATNAMANI", "WELCORP", "JSPL", "MOIL", "GMRINFRA",
+
+    # Energy & Oil
+    "RELIANCE", "ONGC", "IOC", "BPCL", "HPCL",
+    "GAIL", "PETRONET", "IGL", "MGL", "GUJARATGAS",
+    "ATGL", "INDRAPRASTHA", "TORNTPOWER", "ADANIGREEN", "ADANIPOWER",
+
+    # Telecom
+    "BHARTIARTL", "IDEA", "RCOM", "MTNL", "BSNL",
+    "TEJAS", "STERLITE", "GTPL", "HFCL", "RAILTEL",
+
+    # Real Estate
+    "DLF", "GODREJPROP", "OBEROI", "BRIGADE", "SOBHA",
+    "PHOENIXLTD", "SUNTECK", "KOLTE", "MAHLIFE", "LODHA",
+    "PRESTIGE", "PURAVANKARA", "INDIABULLS", "UNITECH", "PARSVNATH",
+
+    # Infrastructure
+    "LT", "IRB", "SADBHAV", "KNR", "CONCOR",
+    "GMRINFRA", "GVK", "JPASSOCIAT", "HCC", "TEXRAIL",
+    "KERNEX", "PNCINFRA", "CAPACITE", "NAVINFLUOR", "KEI",
+
+    # Textiles
+    "TRIDENT", "VARDHMAN", "WELSPUNIND", "ORIENTBELL", "CENTURYTEX",
+    "RAYMONDS", "AARVEE", "FILATEX", "SUTLEJ", "SPENTEX",
+    "ALOKTEXT", "SHARDA", "RAJRATAN", "KPR", "GRASIM",
+
+    # Consumer Services
+    "INDIGO", "JUBLFOOD", "DMART", "TRENT", "NYKAA",
+    "ZOMATO", "PAYTM", "POLICYBZR", "NAUKRI", "IRCTC",
+    "PVR", "INOX", "CRISIL", "CDSL", "MCX",
+
+    # Chemicals
+    "UPL", "DEEPAKNTR", "SRF", "PIDILITIND", "AARTI",
+    "BALRAMCHIN", "ROSSARI", "CLEAN", "TATACHEM", "GHCL",
+    "NOCIL", "ALKYLAMIN", "FLUOROCHEM", "VIPIND", "CHAMPION",
+
+    # Capital Goods
+    "ABB", "SIEMENS", "BHEL", "CUMMINSIND", "THERMAX",
+    "VOLTAS", "BLUEDART", "CROMPTON", "HAVELLS", "POLYCAB",
+    "KEI", "FINOLEX", "ASTRAL", "SUPREME", "DIXON",
+
+    # New Age Tech
+    "ZOMATO", "PAYTM", "NYKAA", "POLICYBZR", "CARTRADE",
+    "EASEMYTRIP", "DEVYANI", "SAPPHIRE", "ANUPAMRAS", "LATENTVIEW",
+    "HAPPSTMNDS", "ROUTE", "NEWGEN", "KPITTECH", "INTELLECT",
+
+    # Small & Mid Cap Popular
+    "ASTRAL", "POLYCAB", "DIXON", "CROMPTON", "LALPATHLAB",
+    "METROPOLIS", "GRANULES", "LAURUSLABS", "PERSISTENT", "COFORGE",
+    "LTIM", "HAPPSTMNDS", "ROUTE", "VBL", "RADICO",
+    "EMAMILTD", "GILLETTE", "TRIDENT", "VARDHMAN", "WELSPUNIND",
+
+    # Additional Quality Stocks
+    "POLYMED", "PGHH", "GODREJIND", "SYMPHONY", "RELAXO",
+    "BATA", "PAGEIND", "TITAN", "KALYAN", "PCJEWELLER",
+    "RAJESHEXPO", "THANGAMAY", "GITANJALI", "VAIBHAVGBL", "TBZ",
+})
+
+def upsert_chunk_size(dialect: str, column_count: int) -> int:
+    """
+    Rows per multi-row upsert that keep its bound parameters within the dialect's limit
+    """
+    if dialect == 'sqlite':
+        return max(1, SQLITE_MAX_VARIABLES // column_count)
+    return UPSERT_CHUNK_SIZE
+
 class ComprehensiveStockPopulator:
     """
     Comprehensive stock populator for Indian markets (NSE/BSE)
@@ -33,8 +197,10 @@ class ComprehensiveStockPopulator:
     
     def __init__(self):
         self.session = SessionLocal()
+        
         self.total_stocks_added = 0
         self.total_stocks_updated = 0
+        self.total_stocks_unchanged = 0
         self.failed_stocks = []
     
     def get_nse_stock_symbols(self) -> List[str]:
@@ -44,137 +210,27 @@ class ComprehensiveStockPopulator:
         """
         logger.info("Compiling comprehensive NSE stock symbol list...")
         
-        # Comprehensive NSE stock symbols from major indices
-        nse_symbols = [
-            # NIFTY 50
-            "ADANIENT", "ADANIPORTS", "APOLLOHOSP", "ASIANPAINT", "AXISBANK",
-            "BAJAJ-AUTO", "BAJFINANCE", "BAJAJFINSV", "BPCL", "BHARTIARTL",
-            "BRITANNIA", "CIPLA", "COALINDIA", "DIVISLAB", "DRREDDY",
-            "EICHERMOT", "GRASIM", "HCLTECH", "HDFCBANK", "HDFCLIFE",
-            "HEROMOTOCO", "HINDALCO", "HINDUNILVR", "ICICIBANK", "ITC",
-            "INDUSINDBK", "INFY", "JSWSTEEL", "KOTAKBANK", "LT",
-            "M&M", "MARUTI", "NESTLEIND", "NTPC", "ONGC",
-            "POWERGRID", "RELIANCE", "SBILIFE", "SBIN", "SUNPHARMA",
-            "TCS", "TATACONSUM", "TATAMOTORS", "TATASTEEL", "TECHM",
-            "TITAN", "ULTRACEMCO", "UPL", "WIPRO",
-            
-            # NIFTY NEXT 50
-            "ABB", "ACC", "ADANIGREEN", "ADANIPOWER", "AMBUJACEM",
-            "AUBANK", "AUROPHARMA", "BANDHANBNK", "BANKBARODA", "BATAINDIA",
-            "BEL", "BERGEPAINT", "BIOCON", "BOSCHLTD", "CANBK",
-            "CHOLAFIN", "COLPAL", "CONCOR", "CUMMINSIND", "DABUR",
-            "DEEPAKNTR", "DMART", "EXIDEIND", "FEDERALBNK", "GAIL",
-            "GODREJCP", "GODREJPROP", "HAVELLS", "HFCL", "IBULHSGFIN",
-            "ICICIPRULI", "IDEA", "IDFCFIRSTB", "IGL", "INDIGO",
-            "IOC", "IRCTC", "JINDALSTEL", "JUBLFOOD", "LICHSGFIN",
-            "LUPIN", "MARICO", "MCDOWELL-N", "MFSL", "MGL",
-            "MINDTREE", "MOTHERSUMI", "MPHASIS", "MRF", "MUTHOOTFIN",
-            
-            # Banking Stocks
-            "YESBANK", "RBLBANK", "PNB", "UNIONBANK", "CENTRALBK",
-            "INDIANB", "IDFCFIRSTB", "EQUITAS", "UJJIVAN", "SURYODAY",
-            "ESAFSFB", "FINPIPE", "CAPITALFIRST", "DCBBANK", "SOUTHBANK",
-            "ORIENTBANK", "CORPBANK", "SYNDIBANK", "VIJAYABANK", "DENABANK",
-            
-            # IT Stocks
-            "LTIM", "PERSISTENT", "COFORGE", "MINDTREE", "MPHASIS",
-            "LTTS", "CYIENT", "HEXAWARE", "ZENSAR", "NIITTECH",
-            "KPITTECH", "RAMSARUP", "SONATSOFTW", "NELCO", "SAKSOFT",
-            "TATAELXSI", "HAPPSTMNDS", "ROUTE", "INTELLECT", "SUBEX",
-            
-            # Pharmaceutical Stocks
-            "GLENMARK", "CADILAHC", "TORNTPHARM", "ALKEM", "IPCALAB",
-            "GRANULES", "LAURUSLABS", "DIVIS", "LALPATHLAB", "METROPOLIS",
-            "THYROCARE", "KRSNAA", "VIJAYA", "SOLARA", "STRIDES",
-            "BLISSGVS", "PFIZER", "SANOFI", "GLAXO", "NOVARTIS",
-            
-            # Auto Stocks
-            "TVSMOTOR", "BAJAJ-AUTO", "HEROMOTOCO", "EICHERMOT", "MARUTI",
-            "TATAMOTORS", "M&M", "ASHOKLEY", "FORCEMOT", "ESCORTS",
-            "APOLLOTYRE", "MRF", "CEAT", "JK", "BALKRISIND",
-            "MOTHERSUMI", "BOSCHLTD", "WABCOINDIA", "ENDURANCE", "SUPRAJIT",
-            
-            # FMCG Stocks
-            "HINDUNILVR", "ITC", "NESTLEIND", "BRITANNIA", "DABUR",
-            "GODREJCP", "MARICO", "COLPAL", "EMAMILTD", "GILLETTE",
-            "VBL", "RADICO", "MCDOWELL-N", "CCL", "BAJAJCON",
-            "PATANJALI", "JYOTHYLAB", "HONASA", "NYKAA", "KALYANI",
-            
-            # Cement Stocks
-            "ULTRACEMCO", "ACC", "AMBUJACEM", "SHREECEM", "DALMIACMT",
-            "RAMCOCEM", "HEIDELBERG", "JKCEMENT", "ORIENTCEM", "PRISM",
-            "BIRLACEM", "KESORAMIND", "SANGHINDIA", "MAGMA", "BURNPUR",
-            
-            # Steel & Metals
-            "TATASTEEL", "JSWSTEEL", "HINDALCO", "JINDALSTEL", "SAIL",
-            "NMDC", "COALINDIA", "VEDL", "HINDZINC", "NATIONALUM",
-            "RATNAMANI", "WELCORP", "JSPL", "MOIL", "GMRINFRA",
-            
-            # Energy & Oil
-            "RELIANCE", "ONGC", "IOC", "BPCL", "HPCL",
-            "GAIL", "PETRONET", "IGL", "MGL", "GUJARATGAS",
-            "ATGL", "INDRAPRASTHA", "TORNTPOWER", "ADANIGREEN", "ADANIPOWER",
-            
-            # Telecom
-            "BHARTIARTL", "IDEA", "RCOM", "MTNL", "BSNL",
-            "TEJAS", "STERLITE", "GTPL", "HFCL", "RAILTEL",
-            
-            # Real Estate
-            "DLF", "GODREJPROP", "OBEROI", "BRIGADE", "SOBHA",
-            "PHOENIXLTD", "SUNTECK", "KOLTE", "MAHLIFE", "LODHA",
-            "PRESTIGE", "PURAVANKARA", "INDIABULLS", "UNITECH", "PARSVNATH",
-            
-            # Infrastructure
-            "LT", "IRB", "SADBHAV", "KNR", "CONCOR",
-            "GMRINFRA", "GVK", "JPASSOCIAT", "HCC", "TEXRAIL",
-            "KERNEX", "PNCINFRA", "CAPACITE", "NAVINFLUOR", "KEI",
-            
-            # Textiles
-            "TRIDENT", "VARDHMAN", "WELSPUNIND", "ORIENTBELL", "CENTURYTEX",
-            "RAYMONDS", "AARVEE", "FILATEX", "SUTLEJ", "SPENTEX",
-            "ALOKTEXT", "SHARDA", "RAJRATAN", "KPR", "GRASIM",
-            
-            # Consumer Services
-            "INDIGO", "JUBLFOOD", "DMART", "TRENT", "NYKAA",
-            "ZOMATO", "PAYTM", "POLICYBZR", "NAUKRI", "IRCTC",
-            "PVR", "INOX", "CRISIL", "CDSL", "MCX",
-            
-            # Chemicals
-            "UPL", "DEEPAKNTR", "SRF", "PIDILITIND", "AARTI",
-            "BALRAMCHIN", "ROSSARI", "CLEAN", "TATACHEM", "GHCL",
-            "NOCIL", "ALKYLAMIN", "FLUOROCHEM", "VIPIND", "CHAMPION",
-            
-            # Capital Goods
-            "ABB", "SIEMENS", "BHEL", "CUMMINSIND", "THERMAX",
-            "VOLTAS", "BLUEDART", "CROMPTON", "HAVELLS", "POLYCAB",
-            "KEI", "FINOLEX", "ASTRAL", "SUPREME", "DIXON",
-            
-            # New Age Tech
-            "ZOMATO", "PAYTM", "NYKAA", "POLICYBZR", "CARTRADE",
-            "EASEMYTRIP", "DEVYANI", "SAPPHIRE", "ANUPAMRAS", "LATENTVIEW",
-            "HAPPSTMNDS", "ROUTE", "NEWGEN", "KPITTECH", "INTELLECT",
-            
-            # Small & Mid Cap Popular
-            "ASTRAL", "POLYCAB", "DIXON", "CROMPTON", "LALPATHLAB",
-            "METROPOLIS", "GRANULES", "LAURUSLABS", "PERSISTENT", "COFORGE",
-            "LTIM", "HAPPSTMNDS", "ROUTE", "VBL", "RADICO",
-            "EMAMILTD", "GILLETTE", "TRIDENT", "VARDHMAN", "WELSPUNIND",
-            
-            # Additional Quality Stocks
-            "POLYMED", "PGHH", "GODREJIND", "SYMPHONY", "RELAXO",
-            "BATA", "PAGEIND", "TITAN", "KALYAN", "PCJEWELLER",
-            "RAJESHEXPO", "THANGAMAY", "GITANJALI", "VAIBHAVGBL", "TBZ",
-        ]
-        
-        # Remove duplicates and return
-        unique_symbols = list(set(nse_symbols))
+        unique_symbols = sorted(NSE_SYMBOLS)
         logger.info(f"Compiled {len(unique_symbols)} unique NSE stock symbols")
         return unique_symbols
     
+    @staticmethod
+    def _quote_cache_ttl() -> int:
+        """
+        Quotes go stale quickly while the market is open, but not overnight
+        """
+        if market_timer.get_market_session().is_open:
+            return QUOTE_CACHE_TTL_MARKET_OPEN
+        return QUOTE_CACHE_TTL_MARKET_CLOSED
+    
     def fetch_stock_data_batch(self, symbols: List[str], batch_size: int = 50) -> Dict[str, Dict]:
         """
         Fetch stock data in batches with progress logging
         """
+        # Imported here because yfinance pulls in pandas/numpy, which is only
+        # worth paying for when population actually runs
+        import yfinance as yf
+        
         all_stock_data = {}
         total_batches = (len(symbols) + batch_size - 1) // batch_size
         
@@ -184,131 +240,190 @@ class ComprehensiveStockPopulator:
             
             logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} stocks)")
             
+            # Serve recently fetched quotes from the cache
+            cached = cache.get_many(QUOTE_CACHE_KEY.format(symbol=symbol) for symbol in batch)
+            for symbol in batch:
+                stock_data = cached.get(QUOTE_CACHE_KEY.format(symbol=symbol))
+                if stock_data is not None:
+                    all_stock_data[symbol] = stock_data
+            
+            batch = [symbol for symbol in batch if symbol not in all_stock_data]
+            if not batch:
+                logger.info(f"Batch {batch_num} served entirely from cache")
+                continue
+            
             # Add .NS suffix for NSE stocks
             yahoo_symbols = [f"{symbol}.NS" for symbol in batch]
             
-            try:
-                # Download data with progress
-                data = yf.download(yahoo_symbols, period="5d", progress=False, threads=True)
-                
-                if data.empty:
-                    logger.warning(f"No data returned for batch {batch_num}")
-                    continue
-                
-                # Process each stock in the batch
-                for j, symbol in enumerate(batch):
-                    yahoo_symbol = yahoo_symbols[j]
+            # Process each stock in the batch
+            for symbol, yahoo_symbol in zip(batch, yahoo_symbols):
+                try:
+                    # The quote summary already carries the latest and previous
+                    # close, so no price history needs to be downloaded
+                    info = yf.Ticker(yahoo_symbol).info
+                    current_price = info.get('regularMarketPrice') or info.get('currentPrice')
                     
-                    try:
-                        # Handle both single and multi-stock data structures
-                        if len(batch) == 1:
-                            close_data = data['Close'] if 'Close' in data.columns else data
-                        else:
-                            close_data = data[yahoo_symbol]['Close'] if yahoo_symbol in data.columns.levels[0] else None
+                    if current_price:
+                        previous_price = (
+                            info.get('regularMarketPreviousClose')
+                            or info.get('previousClose')
+                            or current_price
+                        )
                         
-                        if close_data is not None and not close_data.empty:
-                            # Get price data
-                            current_price = float(close_data.iloc[-1])
-                            previous_price = float(close_data.iloc[-2]) if len(close_data) > 1 else current_price
-                            
-                            # Try to get additional info from yfinance ticker
-                            ticker = yf.Ticker(yahoo_symbol)
-                            info = ticker.info
-                            
-                            stock_data = {
-                                'symbol': symbol,
-                                'name': info.get('longName', info.get('shortName', symbol)),
-                                'current_price': current_price,
-                                'previous_close': previous_price,
-                                'exchange': 'NSE',
-                                'sector': info.get('sector', 'Unknown'),
-                                'market_cap': info.get('marketCap', 0),
-                                'has_data': True
-                            }
-                            
-                            all_stock_data[symbol] = stock_data
-                            
-                        else:
-                            # No price data available
-                            all_stock_data[symbol] = {
-                                'symbol': symbol,
-                                'name': symbol,
-                                'current_price': 100.0,
-                                'previous_close': 100.0,
-                                'exchange': 'NSE',
-                                'sector': 'Unknown',
-                                'market_cap': 0,
-                                'has_data': False
-                            }
-                            
-                    except Exception as e:
-                        logger.warning(f"Error processing {symbol}: {e}")
-                        self.failed_stocks.append(symbol)
-                        continue
-                
-                # Progress update
-                processed_stocks = min((batch_num * batch_size), len(symbols))
-                logger.info(f"Progress: {processed_stocks}/{len(symbols)} stocks processed ({(processed_stocks/len(symbols)*100):.1f}%)")
-                
-                # Rate limiting to be respectful to Yahoo Finance
-                time.sleep(1)
-                
-            except Exception as e:
-                logger.error(f"Error fetching batch {batch_num}: {e}")
-                # Add failed stocks to the list
-                self.failed_stocks.extend(batch)
-                continue
+                        all_stock_data[symbol] = {
+                            'symbol': symbol,
+                            'name': info.get('longName', info.get('shortName', symbol)),
+                            'current_price': float(current_price),
+                            'previous_close': float(previous_price),
+                            'exchange': 'NSE',
+                            'sector': info.get('sector', 'Unknown'),
+                            'market_cap': info.get('marketCap', 0),
+                            'has_data': True
+                        }
+                        
+                    else:
+                        # No price data available
+                        all_stock_data[symbol] = {
+                            'symbol': symbol,
+                            'name': symbol,
+                            'current_price': 100.0,
+                            'previous_close': 100.0,
+                            'exchange': 'NSE',
+                            'sector': 'Unknown',
+                            'market_cap': 0,
+                            'has_data': False
+                        }
+                        
+                except Exception as e:
+                    logger.warning(f"Error processing {symbol}: {e}")
+                    self.failed_stocks.append(symbol)
+                    continue
+            
+            # Cache the quotes we actually got data for
+            cache.set_many(
+                {
+                    QUOTE_CACHE_KEY.format(symbol=symbol): all_stock_data[symbol]
+                    for symbol in batch
+                    if all_stock_data.get(symbol, {}).get('has_data')
+                },
+                ttl=self._quote_cache_ttl(),
+            )
+            
+            # Progress update
+            processed_stocks = min((batch_num * batch_size), len(symbols))
+            logger.info(f"Progress: {processed_stocks}/{len(symbols)} stocks processed ({(processed_stocks/len(symbols)*100):.1f}%)")
+            
+            # Rate limiting to be respectful to Yahoo Finance
+            time.sleep(1)
         
         logger.info(f"Successfully fetched data for {len(all_stock_data)} stocks")
         return all_stock_data
     
+    def retry_failed_stocks(self, stock_data: Dict[str, Dict], batch_size: int) -> None:
+        """
+        Retry failed stocks with exponential backoff, halving the batch size each time
+        Recovered stocks are added to stock_data in place
+        """
+        for attempt in range(FAILED_STOCK_RETRIES):
+            if not self.failed_stocks:
+                break
+            
+            retry_symbols = self.failed_stocks
+            self.failed_stocks = []
+            batch_size = max(1, batch_size // 2)
+            
+            # 1s, 2s, 4s ... plus jitter, so retries don't hit Yahoo in lockstep
+            delay = min(RETRY_BACKOFF_MAX, 2 ** attempt) + random.uniform(0, 1)
+            logger.info(f"Retrying {len(retry_symbols)} failed stocks in {delay:.1f}s (attempt {attempt + 1}/{FAILED_STOCK_RETRIES}, batch size {batch_size})")
+            time.sleep(delay)
+            
+            stock_data.update(self.fetch_stock_data_batch(retry_symbols, batch_size=batch_size))
+    
+    def _insert_for_dialect(self):
+        """
+        Get the dialect-specific insert() that supports ON CONFLICT
+        """
+        dialect = self.session.get_bind().dialect.name
+        if dialect not in UPSERT_INSERTS:
+            raise NotImplementedError(f"Stock upsert is not supported on {dialect}")
+        return UPSERT_INSERTS[dialect]
+    
     def populate_database(self, stock_data: Dict[str, Dict]) -> None:
         """
         Populate database with stock data
+        New stocks are inserted and existing ones updated in the same
+        INSERT ... ON CONFLICT (symbol) DO UPDATE statement
         """
         logger.info("Starting database population...")
         
         try:
-            # Get existing stocks
-            existing_stocks = {stock.symbol: stock for stock in self.session.query(Stock).all()}
-            logger.info(f"Found {len(existing_stocks)} existing stocks in database")
+            now = get_ist_now()
+            # last_updated is a naive column: store IST wall-clock time explicitly, since
+            # psycopg2 would send an aware value as timestamptz and PostgreSQL would keep
+            # the session-timezone wall clock instead
+            last_updated = now.replace(tzinfo=None)
+            rows = [
+                {
+                    'symbol': data['symbol'],
+                    'name': data['name'],
+                    'current_price': data['current_price'],
+                    'previous_close': data['previous_close'],
+                    'exchange': data['exchange'],
+                    'sector': data.get('sector', 'Unknown'),
+                    'is_active': True,
+                    'last_updated': last_updated,
+                }
+                for data in stock_data.values()
+            ]
             
-            # Process each stock
-            for symbol, data in stock_data.items():
-                try:
-                    if symbol in existing_stocks:
-                        # Update existing stock
-                        existing_stock = existing_stocks[symbol]
-                        existing_stock.name = data['name']
-                        existing_stock.current_price = data['current_price']
-                        existing_stock.previous_close = data['previous_close']
-                        existing_stock.sector = data.get('sector', 'Unknown')
-                        
-                        self.total_stocks_updated += 1
-                        
-                    else:
-                        # Create new stock
-                        stock_create = StockCreate(
-                            symbol=data['symbol'],
-                            name=data['name'],
-                            current_price=data['current_price'],
-                            previous_close=data['previous_close'],
-                            exchange=data['exchange'],
-                            sector=data.get('sector', 'Unknown')
-                        )
-                        
-                        new_stock = stock_crud.create(self.session, obj_in=stock_create)
-                        self.total_stocks_added += 1
-                        
-                        if self.total_stocks_added % 100 == 0:
-                            logger.info(f"Added {self.total_stocks_added} new stocks...")
+            insert = self._insert_for_dialect()
+            chunk_size = upsert_chunk_size(self.session.get_bind().dialect.name, len(rows[0]) if rows else 1)
+            for i in range(0, len(rows), chunk_size):
+                chunk = rows[i:i + chunk_size]
                 
-                except Exception as e:
-                    logger.error(f"Error processing stock {symbol}: {e}")
-                    continue
+                # Only used to report how many rows were added vs updated;
+                # probes the unique symbol index for just this chunk
+                existing_count = self.session.scalar(
+                    select(func.count())
+                    .select_from(Stock)
+                    .where(Stock.symbol.in_([row['symbol'] for row in chunk]))
+                )
+                added_count = len(chunk) - existing_count
+                self.total_stocks_added += added_count
+                
+                stmt = insert(Stock).values(chunk)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Stock.symbol],
+                    set_={
+                        'name': stmt.excluded.name,
+                        'current_price': stmt.excluded.current_price,
+                        'previous_close': stmt.excluded.previous_close,
+                        'sector': stmt.excluded.sector,
+                        'last_updated': stmt.excluded.last_updated,
+                    },
+                    # Skip the write entirely when nothing changed (e.g. outside
+                    # market hours), avoiding the row rewrite and its WAL traffic
+                    where=or_(
+                        Stock.name.is_distinct_from(stmt.excluded.name),
+                        Stock.current_price.is_distinct_from(stmt.excluded.current_price),
+                        Stock.previous_close.is_distinct_from(stmt.excluded.previous_close),
+                        Stock.sector.is_distinct_from(stmt.excluded.sector),
+                    ),
+                )
+                result = self.session.execute(stmt)
+                
+                # rowcount covers inserted rows plus rows actually updated
+                updated_count = max(result.rowcount - added_count, 0)
+                self.total_stocks_updated += updated_count
+                self.total_stocks_unchanged += existing_count - updated_count
             
-            # Commit all changes
+            # Commit all changes and drop cached stock responses
             self.session.commit()
+            cache.delete_prefix("stocks:")
+            # Unchanged rows keep their old last_updated, so record the run itself
+            # for stocks_are_fresh
+            cache.set_value(POPULATION_COMPLETED_KEY, now.isoformat(),
+                            int(STOCK_FRESHNESS_WINDOW.total_seconds()))
             logger.info("Database population completed successfully")
             
         except Exception as e:
@@ -316,6 +431,35 @@ class ComprehensiveStockPopulator:
             self.session.rollback()
             raise
     
+    def stocks_are_fresh(self) -> bool:
+        """
+        Check whether the stock table was refreshed recently enough to skip population
+        """
+        if os.getenv("FORCE_STOCK_REPOPULATE") == "1":
+            return False
+        
+        # A run that changed no prices (market closed) bumps no last_updated,
+        # so prefer the recorded completion time of the last population run
+        completed_at = cache.get_value(POPULATION_COMPLETED_KEY)
+        if completed_at is not None:
+            age = get_ist_now() - datetime.fromisoformat(completed_at)
+            if timedelta(0) <= age < STOCK_FRESHNESS_WINDOW:
+                return True
+        
+        last_updated = self.session.scalar(select(func.max(Stock.last_updated)))
+        if last_updated is None:
+            return False
+        
+        # populate_database stores naive IST wall-clock time on every backend,
+        # so compare it against naive IST now
+        age = get_ist_now().replace(tzinfo=None) - last_updated
+        if age < -STOCK_CLOCK_SKEW_TOLERANCE:
+            # A freshly written row should be ~0 old; a negative age means the
+            # stored timestamps don't follow the IST convention, so don't trust them
+            logger.warning(f"Stock last_updated is {-age} in the future, ignoring freshness check")
+            return False
+        return age < STOCK_FRESHNESS_WINDOW
+    
     async def populate_stocks(self) -> None:
         """
         Main method to populate stocks with comprehensive logging
@@ -324,17 +468,23 @@ class ComprehensiveStockPopulator:
         logger.info("🚀 Starting comprehensive Indian stock population...")
         
         try:
+            if self.stocks_are_fresh():
+                logger.info("✅ Stocks were updated within the last hour, skipping population")
+                return
+            
             # Step 1: Get stock symbols
             symbols = self.get_nse_stock_symbols()
             logger.info(f"📊 Target: {len(symbols)} Indian stocks from NSE")
             
             # Step 2: Fetch stock data
             logger.info("📈 Fetching real-time stock data from Yahoo Finance...")
-            stock_data = self.fetch_stock_data_batch(symbols, batch_size=30)
+            stock_data = await asyncio.to_thread(self.fetch_stock_data_batch, symbols, batch_size=30)
+            if self.failed_stocks:
+                await asyncio.to_thread(self.retry_failed_stocks, stock_data, batch_size=30)
             
             # Step 3: Populate database
             logger.info("💾 Populating database with stock data...")
-            self.populate_database(stock_data)
+            await asyncio.to_thread(self.populate_database, stock_data)
             
             # Step 4: Final statistics
             end_time = time.time()
@@ -343,6 +493,7 @@ class ComprehensiveStockPopulator:
             logger.info("✅ Stock population completed!")
             logger.info(f"📈 New stocks added: {self.total_stocks_added}")
             logger.info(f"🔄 Existing stocks updated: {self.total_stocks_updated}")
+            logger.info(f"⏭️  Unchanged stocks skipped: {self.total_stocks_unchanged}")
             logger.info(f"❌ Failed stocks: {len(self.failed_stocks)}")
             logger.info(f"⏱️  Total time: {duration:.2f} seconds")
             
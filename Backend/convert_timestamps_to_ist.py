@@ -5,85 +5,102 @@ Script to convert existing UTC timestamps in database to IST
 This fixes the issue where old transactions show wrong times
 """
 
+import logging
 import sys
 import os
 from datetime import datetime
-import pytz
 
 # Add the Backend directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app.core.config import settings
 from app.models.models import Transaction, User, Portfolio, Stock, Position
 from app.core.database import SessionLocal
-from app.core.timezone_utils import get_ist_now, utc_to_ist
+from app.core.timezone_utils import get_ist_now
+from timestamp_conversion import IST, UTC, release_batch, shift_tables_in_database, stream_rows
 
-def convert_utc_to_ist_in_database():
+logger = logging.getLogger(__name__)
+
+def convert_rows_in_python(db):
     """
-    Convert all UTC timestamps in database tables to IST
+    Convert timestamps row by row for databases without AT TIME ZONE (e.g. SQLite)
     """
-    print("🔄 Starting UTC to IST timestamp conversion...")
+    # Convert Transaction timestamps
+    print("\n📊 Converting Transaction timestamps...")
+    transaction_count = 0
     
-    db = SessionLocal()
-    
-    try:
-        # Convert Transaction timestamps
-        print("\n📊 Converting Transaction timestamps...")
-        transactions = db.query(Transaction).all()
-        transaction_count = 0
-        
+    for transactions in stream_rows(db, Transaction):
         for transaction in transactions:
             if transaction.timestamp:
                 # Check if the timestamp is naive (no timezone info)
                 if transaction.timestamp.tzinfo is None:
                     # Assume it's UTC and convert to IST
-                    utc_time = pytz.utc.localize(transaction.timestamp)
-                    ist_time = utc_to_ist(utc_time)
+                    utc_time = transaction.timestamp.replace(tzinfo=UTC)
+                    ist_time = utc_time.astimezone(IST)
                     transaction.timestamp = ist_time
                     transaction_count += 1
-                    print(f"  ✅ Transaction {transaction.id}: {utc_time} → {ist_time}")
-        
-        # Convert User timestamps
-        print(f"\n👥 Converting User timestamps...")
-        users = db.query(User).all()
-        user_count = 0
+                    logger.debug("Transaction %d: %s -> %s", transaction.id, utc_time, ist_time)
         
+        release_batch(db)
+    
+    # Convert User timestamps
+    print(f"\n👥 Converting User timestamps...")
+    user_count = 0
+    
+    for users in stream_rows(db, User):
         for user in users:
             updated = False
             if user.created_at and user.created_at.tzinfo is None:
-                utc_time = pytz.utc.localize(user.created_at)
-                user.created_at = utc_to_ist(utc_time)
+                user.created_at = user.created_at.replace(tzinfo=UTC).astimezone(IST)
                 updated = True
-            
+        
             if user.updated_at and user.updated_at.tzinfo is None:
-                utc_time = pytz.utc.localize(user.updated_at)
-                user.updated_at = utc_to_ist(utc_time)
+                user.updated_at = user.updated_at.replace(tzinfo=UTC).astimezone(IST)
                 updated = True
-            
+        
             if updated:
                 user_count += 1
-                print(f"  ✅ User {user.id}: timestamps converted to IST")
-        
-        # Convert Portfolio timestamps
-        print(f"\n💼 Converting Portfolio timestamps...")
-        portfolios = db.query(Portfolio).all()
-        portfolio_count = 0
+                logger.debug("User %d: timestamps converted to IST", user.id)
         
+        release_batch(db)
+    
+    # Convert Portfolio timestamps
+    print(f"\n💼 Converting Portfolio timestamps...")
+    portfolio_count = 0
+    
+    for portfolios in stream_rows(db, Portfolio):
         for portfolio in portfolios:
             updated = False
             if portfolio.created_at and portfolio.created_at.tzinfo is None:
-                utc_time = pytz.utc.localize(portfolio.created_at)
-                portfolio.created_at = utc_to_ist(utc_time)
+                portfolio.created_at = portfolio.created_at.replace(tzinfo=UTC).astimezone(IST)
                 updated = True
-            
+        
             if portfolio.updated_at and portfolio.updated_at.tzinfo is None:
-                utc_time = pytz.utc.localize(portfolio.updated_at)
-                portfolio.updated_at = utc_to_ist(utc_time)
+                portfolio.updated_at = portfolio.updated_at.replace(tzinfo=UTC).astimezone(IST)
                 updated = True
-            
+        
             if updated:
                 portfolio_count += 1
-                print(f"  ✅ Portfolio {portfolio.id}: timestamps converted to IST")
+                logger.debug("Portfolio %d: timestamps converted to IST", portfolio.id)
+        
+        release_batch(db)
+    
+    return transaction_count, user_count, portfolio_count
+
+def convert_utc_to_ist_in_database():
+    """
+    Convert all UTC timestamps in database tables to IST
+    """
+    print("🔄 Starting UTC to IST timestamp conversion...")
+    
+    db = SessionLocal()
+    
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            # Let the database convert each table in one statement, all in one transaction
+            print("\n📊 Converting Transaction, User and Portfolio timestamps...")
+            transaction_count, user_count, portfolio_count = shift_tables_in_database(db)
+        else:
+            transaction_count, user_count, portfolio_count = convert_rows_in_python(db)
         
         # Commit all changes
         db.commit()
@@ -102,6 +119,8 @@ def convert_utc_to_ist_in_database():
         db.close()
 
 if __name__ == "__main__":
+    # Per-row details are logged at DEBUG level
+    logging.basicConfig(level=logging.INFO)
     print("=== UTC to IST Database Timestamp Conversion ===")
     
     # Ask for confirmation
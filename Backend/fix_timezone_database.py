@@ -4,10 +4,10 @@
 Fix timezone issue in database by properly converting UTC timestamps to IST
 """
 
+import logging
 import sys
 import os
 from datetime import datetime
-import pytz
 
 # Add the Backend directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -15,79 +15,97 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from app.core.database import SessionLocal
 from app.models.models import Transaction, User, Portfolio
 from app.core.timezone_utils import get_ist_now
+from timestamp_conversion import IST, UTC, release_batch, shift_tables_in_database, stream_rows
 
-def fix_timezone_database():
+logger = logging.getLogger(__name__)
+
+def fix_rows_in_python(db):
     """
-    Convert all naive UTC timestamps in database to timezone-aware IST timestamps
+    Fix timestamps row by row for databases without AT TIME ZONE (e.g. SQLite)
     """
-    print("🔄 Starting timezone database fix...")
+    # Fix Transaction timestamps
+    print("\n📊 Fixing Transaction timestamps...")
+    transaction_count = 0
     
-    db = SessionLocal()
-    
-    try:
-        # Get timezone objects
-        utc_tz = pytz.UTC
-        ist_tz = pytz.timezone('Asia/Kolkata')
-        
-        # Fix Transaction timestamps
-        print("\n📊 Fixing Transaction timestamps...")
-        transactions = db.query(Transaction).all()
-        transaction_count = 0
-        
+    for transactions in stream_rows(db, Transaction):
         for transaction in transactions:
             if transaction.timestamp and transaction.timestamp.tzinfo is None:
                 # The naive datetime is actually UTC, so localize it as UTC first
                 try:
-                    utc_aware = utc_tz.localize(transaction.timestamp)
+                    utc_aware = transaction.timestamp.replace(tzinfo=UTC)
                     # Convert to IST
-                    ist_aware = utc_aware.astimezone(ist_tz)
+                    ist_aware = utc_aware.astimezone(IST)
                     # Update the transaction
                     transaction.timestamp = ist_aware
                     transaction_count += 1
-                    print(f"  ✅ Transaction {transaction.id}: {transaction.timestamp.replace(tzinfo=None)} UTC → {ist_aware}")
+                    logger.debug("Transaction %d: %s UTC -> %s", transaction.id, utc_aware.replace(tzinfo=None), ist_aware)
                 except Exception as e:
                     print(f"  ❌ Error converting transaction {transaction.id}: {e}")
         
-        # Fix User timestamps
-        print(f"\n👥 Fixing User timestamps...")
-        users = db.query(User).all()
-        user_count = 0
-        
+        release_batch(db)
+    
+    # Fix User timestamps
+    print(f"\n👥 Fixing User timestamps...")
+    user_count = 0
+    
+    for users in stream_rows(db, User):
         for user in users:
             try:
                 if user.created_at and user.created_at.tzinfo is None:
-                    utc_aware = utc_tz.localize(user.created_at)
-                    ist_aware = utc_aware.astimezone(ist_tz)
+                    utc_aware = user.created_at.replace(tzinfo=UTC)
+                    ist_aware = utc_aware.astimezone(IST)
                     user.created_at = ist_aware
                     user_count += 1
-                    
+                
                 if user.updated_at and user.updated_at.tzinfo is None:
-                    utc_aware = utc_tz.localize(user.updated_at)
-                    ist_aware = utc_aware.astimezone(ist_tz)
+                    utc_aware = user.updated_at.replace(tzinfo=UTC)
+                    ist_aware = utc_aware.astimezone(IST)
                     user.updated_at = ist_aware
             except Exception as e:
                 print(f"  ❌ Error converting user {user.id}: {e}")
         
-        # Fix Portfolio timestamps
-        print(f"\n💼 Fixing Portfolio timestamps...")
-        portfolios = db.query(Portfolio).all()
-        portfolio_count = 0
-        
+        release_batch(db)
+    
+    # Fix Portfolio timestamps
+    print(f"\n💼 Fixing Portfolio timestamps...")
+    portfolio_count = 0
+    
+    for portfolios in stream_rows(db, Portfolio):
         for portfolio in portfolios:
             try:
                 if portfolio.created_at and portfolio.created_at.tzinfo is None:
-                    utc_aware = utc_tz.localize(portfolio.created_at)
-                    ist_aware = utc_aware.astimezone(ist_tz)
+                    utc_aware = portfolio.created_at.replace(tzinfo=UTC)
+                    ist_aware = utc_aware.astimezone(IST)
                     portfolio.created_at = ist_aware
                     portfolio_count += 1
-                    
+                
                 if portfolio.updated_at and portfolio.updated_at.tzinfo is None:
-                    utc_aware = utc_tz.localize(portfolio.updated_at)
-                    ist_aware = utc_aware.astimezone(ist_tz)
+                    utc_aware = portfolio.updated_at.replace(tzinfo=UTC)
+                    ist_aware = utc_aware.astimezone(IST)
                     portfolio.updated_at = ist_aware
             except Exception as e:
                 print(f"  ❌ Error converting portfolio {portfolio.id}: {e}")
         
+        release_batch(db)
+    
+    return transaction_count, user_count, portfolio_count
+
+def fix_timezone_database():
+    """
+    Convert all naive UTC timestamps in database to timezone-aware IST timestamps
+    """
+    print("🔄 Starting timezone database fix...")
+    
+    db = SessionLocal()
+    
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            # Let the database fix each table in one statement, all in one transaction
+            print("\n📊 Fixing Transaction, User and Portfolio timestamps...")
+            transaction_count, user_count, portfolio_count = shift_tables_in_database(db)
+        else:
+            transaction_count, user_count, portfolio_count = fix_rows_in_python(db)
+        
         # Commit all changes
         db.commit()
         
@@ -113,5 +131,7 @@ def fix_timezone_database():
         db.close()
 
 if __name__ == "__main__":
+    # Per-row details are logged at DEBUG level
+    logging.basicConfig(level=logging.INFO)
     print("=== Database Timezone Fix ===")
     fix_timezone_database()
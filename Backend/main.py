@@ -1,15 +1,29 @@
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
+import orjson
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
 import uvicorn
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
 import logging
+import math
+import time
 import os
 
 from app.core.config import settings
 from app.api.api_v1.api import api_router
+from app.api.deps import get_db
+from app.core import cache
+from app.core.database import Base, engine
+from app.models.models import Stock
 from app.services.stock_population import populate_stocks_on_startup
-from app.services.comprehensive_indian_stocks import populate_all_indian_stocks
+from app.services.comprehensive_indian_stocks import comprehensive_fetcher, populate_all_indian_stocks
 from app.services.price_scheduler import price_scheduler
+from app.services.real_time_fetcher import yahoo_limiter
 from app.services.market_timing import market_timer
 
 # Configure logging
@@ -19,67 +33,52 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    description="AlphaLearn - Stock Trading Platform for Indian Students with Comprehensive Indian Stock Market Coverage",
-    version="2.0.0",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
-)
+# Startup stock population tuning
+STOCK_POPULATION_BATCH_SIZE = 50  # symbols per yfinance download
+STOCK_POPULATION_CONCURRENCY = 8
+STOCK_POPULATION_TARGET = 3000  # symbols
+# Each batch takes up to two Yahoo limiter slots (NSE download, then BSE retry),
+# so budget the limiter's pacing on top of the download time itself
+STOCK_POPULATION_TIMEOUT = 300 + math.ceil(
+    2 * math.ceil(STOCK_POPULATION_TARGET / STOCK_POPULATION_BATCH_SIZE)
+    * yahoo_limiter.time_window / yahoo_limiter.max_calls
+)  # seconds
 
-# Set up CORS - Specific to your deployment domains
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",  # for local dev
-        "https://alpha-learn-xxv4.vercel.app"  # for production
-    ],
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-    allow_headers=["*"],
-    expose_headers=["*"]
-)
+# Stock indexes replaced by ix_stocks_symbol_prefix, dropped by /init-db
+OBSOLETE_STOCK_INDEXES = ("ix_stocks_symbol_lower", "ix_stocks_name_lower")
+
+# Railway runs the production deployment
+IS_RAILWAY = os.getenv("RAILWAY_ENVIRONMENT_NAME") is not None
 
-# Enhanced startup event with comprehensive stock population
-@app.on_event("startup")
-async def startup_event():
+async def initialize_stock_database():
     """
-    Railway-optimized startup event - lightweight initialization
+    Populate the stock database, falling back to the basic population on failure
+    Runs as a background task so the server accepts traffic immediately
     """
-    logger.info("🌟 AlphaLearn FastAPI server starting up...")
-    
-    # Check if we're in Railway environment
-    is_railway = os.getenv("RAILWAY_ENVIRONMENT_NAME") is not None
-    
-    if is_railway:
-        logger.info("🚂 Railway deployment detected - using lightweight startup")
-        logger.info("✅ Server ready for health checks")
-        return
-    
     logger.info("🚀 Initializing comprehensive Indian stock database...")
     logger.info("📊 Data sources: NSE API, Yahoo Finance, curated stock lists")
     
     # Use comprehensive stock population service to get ALL Indian stocks
     try:
-        stock_count = await populate_all_indian_stocks()
+        start_time = time.monotonic()
+        stock_count = await asyncio.wait_for(
+            populate_all_indian_stocks(
+                batch_size=STOCK_POPULATION_BATCH_SIZE,
+                concurrency=STOCK_POPULATION_CONCURRENCY,
+            ),
+            timeout=STOCK_POPULATION_TIMEOUT,
+        )
+        elapsed = time.monotonic() - start_time
+        logger.info(
+            "⏱️  Populated %s stocks in %.1fs (%.1f symbols/sec, batch_size=%d)",
+            stock_count, elapsed, stock_count / max(elapsed, 1e-6), STOCK_POPULATION_BATCH_SIZE
+        )
         logger.info("✅ COMPREHENSIVE stock database initialization completed!")
-        logger.info(f"🎯 Database now contains {stock_count} Indian stocks (Target: 3000+)")
+        logger.info("🎯 Database now contains %s Indian stocks (Target: 3000+)", stock_count)
         logger.info("💹 Includes NSE + BSE with real-time prices from yfinance")
         
-        # Start real-time price updates if market conditions are favorable
-        market_status = market_timer.get_market_status_message()
-        logger.info(f"📊 Market Status: {market_status['message']}")
-        
-        # Auto-start price scheduler
-        try:
-            price_scheduler.start_scheduler()
-            logger.info("🚀 Real-time price update scheduler started!")
-            logger.info("⏰ Updates every 20s during market hours, 5min when closed")
-        except Exception as scheduler_error:
-            logger.warning(f"⚠️  Could not start price scheduler: {scheduler_error}")
-            logger.info("💡 You can manually start it via /api/v1/stocks/start-real-time")
-        
     except Exception as e:
-        logger.error(f"❌ Enhanced stock database initialization failed: {e}")
+        logger.error("❌ Enhanced stock database initialization failed: %s", e)
         logger.info("🔄 Falling back to basic stock population...")
         
         # Fallback to original method
@@ -87,48 +86,149 @@ async def startup_event():
             await populate_stocks_on_startup()
             logger.info("✅ Fallback stock population completed!")
         except Exception as fallback_error:
-            logger.error(f"❌ Fallback also failed: {fallback_error}")
+            logger.error("❌ Fallback also failed: %s", fallback_error)
             logger.info("⚠️  Server will continue running with limited stock data")
 
+def on_stock_population_done(app: FastAPI, task: asyncio.Task):
+    """
+    Mark the stock data as ready once the background population task ends
+    """
+    app.state.stocks_ready = True
+    if task.cancelled():
+        logger.warning("⚠️  Background stock population was cancelled")
+    elif task.exception() is not None:
+        logger.error("❌ Background stock population crashed: %s", task.exception())
+
+# Application lifespan - startup runs before yield, shutdown after
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Railway-optimized startup - lightweight initialization
+    """
+    logger.info("🌟 AlphaLearn FastAPI server starting up...")
+    
+    # Probe Redis once up front so the first cached request does not pay for it
+    await asyncio.to_thread(cache.get_redis)
+    
+    if IS_RAILWAY:
+        logger.info("🚂 Railway deployment detected - using lightweight startup")
+        logger.info("✅ Server ready for health checks")
+        yield
+        return
+    
+    # Populate in the background; /readyz reports when it is done
+    app.state.stocks_ready = False
+    app.state.populate_task = asyncio.create_task(initialize_stock_database())
+    app.state.populate_task.add_done_callback(partial(on_stock_population_done, app))
+    
+    # Market status and the price scheduler do not depend on population
+    market_status, scheduler_result = await asyncio.gather(
+        asyncio.to_thread(market_timer.get_market_status_message),
+        asyncio.to_thread(price_scheduler.start_scheduler),
+        return_exceptions=True
+    )
+    
+    if isinstance(market_status, Exception):
+        logger.warning("⚠️  Could not get market status: %s", market_status)
+    else:
+        logger.info("📊 Market Status: %s", market_status['message'])
+    
+    if isinstance(scheduler_result, Exception):
+        logger.warning("⚠️  Could not start price scheduler: %s", scheduler_result)
+        logger.info("💡 You can manually start it via /api/v1/stocks/start-real-time")
+    else:
+        logger.info("🚀 Real-time price update scheduler started!")
+        logger.info("⏰ Updates every 20s during market hours, 5min when closed")
+    
+    yield
+    
+    # Stop the price update thread so it does not outlive the app
+    if price_scheduler.is_running:
+        price_scheduler.stop_scheduler()
+    
+    # Let an in-flight stock population finish so its commits are not lost
+    populate_task = getattr(app.state, "populate_task", None)
+    if populate_task is not None and not populate_task.done():
+        logger.info("⏳ Waiting for stock population to finish before shutdown...")
+        await populate_task
+    
+    await comprehensive_fetcher.close()
+
+app = FastAPI(
+    title=settings.PROJECT_NAME,
+    description="AlphaLearn - Stock Trading Platform for Indian Students with Comprehensive Indian Stock Market Coverage",
+    version="2.0.0",
+    # The OpenAPI schema and interactive docs are only served outside production
+    openapi_url=None if IS_RAILWAY else f"{settings.API_V1_STR}/openapi.json",
+    docs_url=None if IS_RAILWAY else "/docs",
+    redoc_url=None if IS_RAILWAY else "/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+# Set up CORS - origins come from settings (override with CORS_ALLOW_ORIGINS)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.cors_origins_list,
+    allow_credentials=True,
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
+    allow_headers=["*"],
+    expose_headers=["*"],
+    max_age=86400  # let browsers cache preflight responses for 24h
+)
+
+# Compress larger JSON payloads (stock lists); added last so it wraps CORS
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Include API routes
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 # Root endpoint for health check
+# Static responses are serialized once at import time
+ROOT_RESPONSE_BYTES = orjson.dumps({
+    "message": "AlphaLearn Backend API is running!",
+    "status": "healthy",
+    "version": "2.0.0",
+    "docs_url": "/docs"
+})
+
+HEALTH_RESPONSE_BYTES = orjson.dumps({
+    "status": "ok",
+    "service": "alphalearn-backend",
+    "version": "2.0.0"
+})
+
 @app.get("/")
 def root():
-    return {
-        "message": "AlphaLearn Backend API is running!",
-        "status": "healthy",
-        "version": "2.0.0",
-        "docs_url": "/docs"
-    }
+    return Response(content=ROOT_RESPONSE_BYTES, media_type="application/json")
 
 # Dedicated health check endpoint for Railway
-@app.get("/health")
-def health_check():
-    return {
-        "status": "ok",
-        "service": "alphalearn-backend",
-        "version": "2.0.0"
-    }
+# Registered as a plain Starlette route - no dependency resolution or encoding
+async def health_check(request: Request) -> Response:
+    return Response(content=HEALTH_RESPONSE_BYTES, media_type="application/json")
+
+app.add_route("/health", health_check, methods=["GET"], include_in_schema=False)
+
+# Readiness check - not ready until startup stock population has finished
+READY_RESPONSE_BYTES = orjson.dumps({"status": "ready"})
+STARTING_RESPONSE_BYTES = orjson.dumps({"status": "starting", "stock_population": "in_progress"})
+
+@app.get("/readyz")
+def readiness_check():
+    if not getattr(app.state, "stocks_ready", True):
+        return Response(content=STARTING_RESPONSE_BYTES, status_code=503, media_type="application/json")
+    return Response(content=READY_RESPONSE_BYTES, media_type="application/json")
 
 # Database health check endpoint
 @app.get("/db-health")
-def database_health_check():
+def database_health_check(db: Session = Depends(get_db)):
     try:
-        from app.api.deps import get_db
-        from app.models.models import User
-        
-        # Try to get a database session
-        db = next(get_db())
-        
-        # Try a simple query
-        count = db.query(User).count()
+        # Constant-time liveness query
+        db.execute(text("SELECT 1")).scalar()
         
         return {
             "status": "ok",
             "database": "connected",
-            "user_count": count,
             "database_url": settings.SQLALCHEMY_DATABASE_URI[:50] + "..." if settings.SQLALCHEMY_DATABASE_URI else "Not configured"
         }
     except Exception as e:
@@ -143,11 +243,25 @@ def database_health_check():
 @app.post("/init-db")
 def initialize_database():
     """Initialize database tables if they don't exist"""
+    if getattr(app.state, "db_initialized", False):
+        return {
+            "status": "success",
+            "message": "Database already initialized"
+        }
+    
     try:
-        from app.core.database import Base, engine
+        # Only create tables when some are missing
+        missing_tables = set(Base.metadata.tables) - set(inspect(engine).get_table_names())
+        if missing_tables:
+            Base.metadata.create_all(bind=engine)
         
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
+        # create_all skips indexes on tables that already exist
+        for index in Stock.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+        with engine.begin() as connection:
+            for index_name in OBSOLETE_STOCK_INDEXES:
+                connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+        app.state.db_initialized = True
         
         return {
             "status": "success",
@@ -161,23 +275,38 @@ def initialize_database():
         }
 
 # CORS test endpoint
+# Environment is read once; a redeploy is needed for env var changes anyway
+ENV_VARS_AVAILABLE = {
+    "DATABASE_URL": bool(os.getenv("DATABASE_URL")),
+    "POSTGRES_SERVER": bool(os.getenv("POSTGRES_SERVER")),
+    "RAILWAY_ENVIRONMENT": IS_RAILWAY
+}
+
+CORS_TEST_RESPONSE_BYTES = orjson.dumps({
+    "message": "CORS is working!",
+    "timestamp": "2025-08-02T12:00:00Z",
+    "cors_enabled": True,
+    "deployment_version": "v2.8",
+    "cors_method": "specific_domain_only",
+    "allowed_origins": settings.cors_origins_list,
+    "new_endpoints": ["/auth/login-json", "/db-health", "/init-db"],
+    "database_url_configured": bool(settings.SQLALCHEMY_DATABASE_URI),
+    "env_vars_available": ENV_VARS_AVAILABLE
+})
+
 @app.get("/cors-test")
 def cors_test():
-    return {
-        "message": "CORS is working!",
-        "timestamp": "2025-08-02T12:00:00Z",
-        "cors_enabled": True,
-        "deployment_version": "v2.8",
-        "cors_method": "specific_domain_only",
-        "allowed_origins": ["http://localhost:3000", "https://alpha-learn-xxv4.vercel.app"],
-        "new_endpoints": ["/auth/login-json", "/db-health", "/init-db"],
-        "database_url_configured": bool(settings.SQLALCHEMY_DATABASE_URI),
-        "env_vars_available": {
-            "DATABASE_URL": bool(os.getenv("DATABASE_URL")),
-            "POSTGRES_SERVER": bool(os.getenv("POSTGRES_SERVER")),
-            "RAILWAY_ENVIRONMENT": bool(os.getenv("RAILWAY_ENVIRONMENT_NAME"))
-        }
-    }
+    return Response(content=CORS_TEST_RESPONSE_BYTES, media_type="application/json")
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # uvloop/httptools are picked up automatically when installed;
+    # every worker runs its own startup population and price scheduler
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        reload=settings.DEBUG,
+        loop="auto",
+        http="auto",
+        workers=None if settings.DEBUG else int(os.getenv("WEB_CONCURRENCY", "1"))
+    )
\ No newline at end of file
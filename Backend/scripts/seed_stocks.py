@@ -9,213 +9,258 @@ This script automatically fetches comprehensive stock lists from:
 Usage: python seed_stocks.py
 """
 
+import asyncio
+import csv
+import io
 import sys
 import os
-import requests
-import json
-import time
+import httpx
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Set
+from urllib.parse import quote
+from typing import Dict, FrozenSet, List, Set, Tuple
 import logging
+from datetime import datetime
 
 # Add the parent directory to sys.path to allow imports from the app
 parent_dir = str(Path(__file__).parent.parent)
 sys.path.append(parent_dir)
 
+from sqlalchemy import func, select, text
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import SessionLocal
+from app.core.timezone_utils import IST, get_ist_timestamp
 from app.services.stock_data import StockDataService
+from app.services.stock_population import UPSERT_INSERTS
 from app.models.models import Stock
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# (symbol, name, exchange) as collected from each source; symbols are interned
+# so the same ticker seen by several indices shares one string
+StockTuple = Tuple[str, str, str]
+NSE = sys.intern('NSE')
+BSE = sys.intern('BSE')
+
+# Rows per multi-row INSERT when writing new stocks
+INSERT_BATCH_SIZE = 1000
+
+# Column order for COPY-based loads on PostgreSQL
+SEED_COPY_COLUMNS = ('symbol', 'name', 'current_price', 'previous_close', 'exchange', 'is_active', 'last_updated')
+
+# Concurrent requests per fetcher and retry delays for 429/5xx responses
+MAX_CONCURRENT_REQUESTS = 4
+RETRY_BACKOFF_SECONDS = (1, 2, 4, 8)
+CONNECT_RETRIES = 3
+
+# Parallel Yahoo Finance lookups when pricing new stocks
+YAHOO_MAX_WORKERS = 16
+
+# NSE indices that contain comprehensive stock lists, as (display name, API URL)
+NSE_INDEX_URLS = [
+    (index_name, f"https://www.nseindia.com/api/equity-stockIndices?index={quote(index_name)}")
+    for index_name in (
+        'NIFTY 500',
+        'NIFTY TOTAL MARKET',
+        'NIFTY SMALLCAP 100',
+        'NIFTY MIDCAP 100',
+        'NIFTY LARGEMIDCAP 250',
+    )
+]
+
+# Yahoo Finance screener for Indian markets
+YAHOO_SCREENER_URLS = [
+    'https://query1.finance.yahoo.com/v1/finance/screener/predefined/saved?formatted=true&lang=en-US&region=US&queryId=most_actives&count=1000',
+    'https://query2.finance.yahoo.com/v1/finance/screener/predefined/saved?formatted=true&lang=en-US&region=IN&queryId=most_actives&count=1000'
+]
+
+# Fallback list of popular Indian stocks, built once at import
+POPULAR_STOCKS: FrozenSet[StockTuple] = frozenset([
+    ("RELIANCE", "Reliance Industries Ltd", "NSE"),
+    ("TCS", "Tata Consultancy Services Ltd", "NSE"),
+    ("HDFCBANK", "HDFC Bank Ltd", "NSE"),
+    ("INFY", "Infosys Ltd", "NSE"),
+    ("SBIN", "State Bank of India", "NSE"),
+    ("ICICIBANK", "ICICI Bank Ltd", "NSE"),
+    ("HINDUNILVR", "Hindustan Unilever Ltd", "NSE"),
+    ("BAJFINANCE", "Bajaj Finance Ltd", "NSE"),
+    ("BHARTIARTL", "Bharti Airtel Ltd", "NSE"),
+    ("WIPRO", "Wipro Ltd", "NSE"),
+    ("AXISBANK", "Axis Bank Ltd", "NSE"),
+    ("ITC", "ITC Ltd", "NSE"),
+    ("KOTAKBANK", "Kotak Mahindra Bank Ltd", "NSE"),
+    ("LT", "Larsen & Toubro Ltd", "NSE"),
+    ("ASIANPAINT", "Asian Paints Ltd", "NSE"),
+    ("MARUTI", "Maruti Suzuki India Ltd", "NSE"),
+    ("TATASTEEL", "Tata Steel Ltd", "NSE"),
+    ("TATAMOTORS", "Tata Motors Ltd", "NSE"),
+    ("ADANIENT", "Adani Enterprises Ltd", "NSE"),
+    ("BAJAJ-AUTO", "Bajaj Auto Ltd", "NSE"),
+    ("CIPLA", "Cipla Ltd", "NSE"),
+    ("DRREDDY", "Dr. Reddy's Laboratories Ltd", "NSE"),
+    ("EICHERMOT", "Eicher Motors Ltd", "NSE"),
+    ("GRASIM", "Grasim Industries Ltd", "NSE"),
+    ("HCLTECH", "HCL Technologies Ltd", "NSE"),
+    ("HEROMOTOCO", "Hero MotoCorp Ltd", "NSE"),
+    ("HINDALCO", "Hindalco Industries Ltd", "NSE"),
+    ("INDUSINDBK", "IndusInd Bank Ltd", "NSE"),
+    ("JSWSTEEL", "JSW Steel Ltd", "NSE"),
+    ("M&M", "Mahindra & Mahindra Ltd", "NSE"),
+    ("NESTLEIND", "Nestle India Ltd", "NSE"),
+    ("NTPC", "NTPC Ltd", "NSE"),
+    ("ONGC", "Oil and Natural Gas Corporation Ltd", "NSE"),
+    ("POWERGRID", "Power Grid Corporation of India Ltd", "NSE"),
+    ("SUNPHARMA", "Sun Pharmaceutical Industries Ltd", "NSE"),
+    ("TATACONSUM", "Tata Consumer Products Ltd", "NSE"),
+    ("TECHM", "Tech Mahindra Ltd", "NSE"),
+    ("TITAN", "Titan Company Ltd", "NSE"),
+    ("ULTRACEMCO", "UltraTech Cement Ltd", "NSE"),
+    ("UPL", "UPL Ltd", "NSE"),
+])
+
 class AutomatedStockFetcher:
     """
     Automatically fetch all Indian stocks from multiple free sources
     """
     
     def __init__(self):
-        self.session = requests.Session()
         # Set headers to mimic a browser
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'application/json, text/plain, */*',
             'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-        })
+        }
+        self.client = None
+        self.semaphore = None
+    
+    async def __aenter__(self):
+        # Keep every connection alive between the NSE/Yahoo calls and retry
+        # failed connects at the transport level; HTTP 429/5xx is handled in _get_json
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            transport=httpx.AsyncHTTPTransport(
+                retries=CONNECT_RETRIES,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONCURRENT_REQUESTS,
+                    max_keepalive_connections=MAX_CONCURRENT_REQUESTS,
+                    keepalive_expiry=60.0,
+                ),
+            ),
+        )
+        # Be respectful to the APIs: cap in-flight requests instead of sleeping
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        return self
     
-    def fetch_nse_stocks(self) -> Set[Dict[str, str]]:
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+    
+    async def _get_json(self, url: str):
+        """
+        GET a JSON document, backing off 1, 2, 4, 8s on 429/5xx responses
+        Bodies are decoded straight from bytes with orjson, since the NSE
+        index payloads run to several MB each.
+        """
+        async with self.semaphore:
+            for delay in RETRY_BACKOFF_SECONDS + (None,):
+                response = await self.client.get(url)
+                if response.status_code == 200:
+                    return orjson.loads(response.content)
+                if delay is None or (response.status_code != 429 and response.status_code < 500):
+                    return None
+                await asyncio.sleep(delay)
+    
+    async def fetch_nse_stocks(self) -> Set[StockTuple]:
         """
         Fetch all NSE stocks from NSE's official free API
         """
         logger.info("Fetching stocks from NSE official API...")
         stock_set = set()
         
-        try:
-            # NSE indices that contain comprehensive stock lists
-            indices = [
-                'NIFTY%20500',
-                'NIFTY%20TOTAL%20MARKET',
-                'NIFTY%20SMALLCAP%20100',
-                'NIFTY%20MIDCAP%20100',
-                'NIFTY%20LARGEMIDCAP%20250'
-            ]
+        results = await asyncio.gather(*[self._get_json(url) for _, url in NSE_INDEX_URLS], return_exceptions=True)
+        
+        for (index_name, _), data in zip(NSE_INDEX_URLS, results):
+            if isinstance(data, Exception):
+                logger.warning(f"Error fetching {index_name}: {data}")
+                continue
             
-            for index in indices:
-                try:
-                    url = f'https://www.nseindia.com/api/equity-stockIndices?index={index}'
-                    logger.info(f"Fetching from: {index.replace('%20', ' ')}")
-                    
-                    response = self.session.get(url, timeout=30)
-                    if response.status_code == 200:
-                        data = response.json()
-                        
-                        if 'data' in data:
-                            for stock in data['data']:
-                                if 'symbol' in stock and 'companyName' in stock:
-                                    # Add to set to avoid duplicates
-                                    stock_info = (
-                                        stock['symbol'],
-                                        stock['companyName'],
-                                        'NSE'
-                                    )
-                                    stock_set.add(stock_info)
-                    
-                    # Be respectful to the API
-                    time.sleep(1)
-                    
-                except Exception as e:
-                    logger.warning(f"Error fetching {index}: {e}")
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"Error fetching NSE stocks: {e}")
+            if data and 'data' in data:
+                # Only symbol and companyName are read; add to set to avoid duplicates
+                stock_set.update(
+                    (sys.intern(stock['symbol']), stock['companyName'], NSE)
+                    for stock in data['data']
+                    if 'symbol' in stock and 'companyName' in stock
+                )
         
         logger.info(f"Fetched {len(stock_set)} stocks from NSE")
         return stock_set
     
-    def fetch_yahoo_finance_indian_stocks(self) -> Set[Dict[str, str]]:
+    async def fetch_yahoo_finance_indian_stocks(self) -> Set[StockTuple]:
         """
         Fetch Indian stocks from Yahoo Finance screener
         """
         logger.info("Fetching stocks from Yahoo Finance screener...")
         stock_set = set()
         
-        try:
-            # Yahoo Finance screener for Indian markets
-            screener_urls = [
-                'https://query1.finance.yahoo.com/v1/finance/screener/predefined/saved?formatted=true&lang=en-US&region=US&queryId=most_actives&count=1000',
-                'https://query2.finance.yahoo.com/v1/finance/screener/predefined/saved?formatted=true&lang=en-US&region=IN&queryId=most_actives&count=1000'
-            ]
+        responses = await asyncio.gather(*[self._get_json(url) for url in YAHOO_SCREENER_URLS], return_exceptions=True)
+        
+        for data in responses:
+            if isinstance(data, Exception):
+                logger.warning(f"Error fetching from Yahoo screener: {data}")
+                continue
             
-            for url in screener_urls:
-                try:
-                    response = self.session.get(url, timeout=30)
-                    if response.status_code == 200:
-                        data = response.json()
+            if data and 'finance' in data and 'result' in data['finance']:
+                results = data['finance']['result']
+                if results and len(results) > 0 and 'quotes' in results[0]:
+                    for yahoo_quote in results[0]['quotes']:
+                        symbol = yahoo_quote.get('symbol', '')
+                        name = yahoo_quote.get('longName', yahoo_quote.get('shortName', ''))
                         
-                        if 'finance' in data and 'result' in data['finance']:
-                            results = data['finance']['result']
-                            if results and len(results) > 0 and 'quotes' in results[0]:
-                                for quote in results[0]['quotes']:
-                                    symbol = quote.get('symbol', '')
-                                    name = quote.get('longName', quote.get('shortName', ''))
-                                    
-                                    # Filter for Indian stocks (.NS or .BO suffix)
-                                    if '.NS' in symbol or '.BO' in symbol:
-                                        exchange = 'NSE' if '.NS' in symbol else 'BSE'
-                                        clean_symbol = symbol.replace('.NS', '').replace('.BO', '')
-                                        
-                                        stock_info = (clean_symbol, name, exchange)
-                                        stock_set.add(stock_info)
-                    
-                    time.sleep(1)
-                    
-                except Exception as e:
-                    logger.warning(f"Error fetching from Yahoo screener: {e}")
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"Error fetching Yahoo Finance stocks: {e}")
+                        # Filter for Indian stocks (.NS or .BO suffix)
+                        if '.NS' in symbol or '.BO' in symbol:
+                            exchange = NSE if '.NS' in symbol else BSE
+                            clean_symbol = sys.intern(symbol.replace('.NS', '').replace('.BO', ''))
+                            
+                            stock_info = (clean_symbol, name, exchange)
+                            stock_set.add(stock_info)
         
         logger.info(f"Fetched {len(stock_set)} stocks from Yahoo Finance")
         return stock_set
     
-    def fetch_popular_indian_stocks(self) -> Set[Dict[str, str]]:
+    def fetch_popular_indian_stocks(self) -> FrozenSet[StockTuple]:
         """
         Fallback list of popular Indian stocks
         """
         logger.info("Using fallback list of popular Indian stocks...")
         
-        popular_stocks = [
-            ("RELIANCE", "Reliance Industries Ltd", "NSE"),
-            ("TCS", "Tata Consultancy Services Ltd", "NSE"),
-            ("HDFCBANK", "HDFC Bank Ltd", "NSE"),
-            ("INFY", "Infosys Ltd", "NSE"),
-            ("SBIN", "State Bank of India", "NSE"),
-            ("ICICIBANK", "ICICI Bank Ltd", "NSE"),
-            ("HINDUNILVR", "Hindustan Unilever Ltd", "NSE"),
-            ("BAJFINANCE", "Bajaj Finance Ltd", "NSE"),
-            ("BHARTIARTL", "Bharti Airtel Ltd", "NSE"),
-            ("WIPRO", "Wipro Ltd", "NSE"),
-            ("AXISBANK", "Axis Bank Ltd", "NSE"),
-            ("ITC", "ITC Ltd", "NSE"),
-            ("KOTAKBANK", "Kotak Mahindra Bank Ltd", "NSE"),
-            ("LT", "Larsen & Toubro Ltd", "NSE"),
-            ("ASIANPAINT", "Asian Paints Ltd", "NSE"),
-            ("MARUTI", "Maruti Suzuki India Ltd", "NSE"),
-            ("TATASTEEL", "Tata Steel Ltd", "NSE"),
-            ("TATAMOTORS", "Tata Motors Ltd", "NSE"),
-            ("ADANIENT", "Adani Enterprises Ltd", "NSE"),
-            ("BAJAJ-AUTO", "Bajaj Auto Ltd", "NSE"),
-            ("CIPLA", "Cipla Ltd", "NSE"),
-            ("DRREDDY", "Dr. Reddy's Laboratories Ltd", "NSE"),
-            ("EICHERMOT", "Eicher Motors Ltd", "NSE"),
-            ("GRASIM", "Grasim Industries Ltd", "NSE"),
-            ("HCLTECH", "HCL Technologies Ltd", "NSE"),
-            ("HEROMOTOCO", "Hero MotoCorp Ltd", "NSE"),
-            ("HINDALCO", "Hindalco Industries Ltd", "NSE"),
-            ("INDUSINDBK", "IndusInd Bank Ltd", "NSE"),
-            ("JSWSTEEL", "JSW Steel Ltd", "NSE"),
-            ("M&M", "Mahindra & Mahindra Ltd", "NSE"),
-            ("NESTLEIND", "Nestle India Ltd", "NSE"),
-            ("NTPC", "NTPC Ltd", "NSE"),
-            ("ONGC", "Oil and Natural Gas Corporation Ltd", "NSE"),
-            ("POWERGRID", "Power Grid Corporation of India Ltd", "NSE"),
-            ("SUNPHARMA", "Sun Pharmaceutical Industries Ltd", "NSE"),
-            ("TATACONSUM", "Tata Consumer Products Ltd", "NSE"),
-            ("TECHM", "Tech Mahindra Ltd", "NSE"),
-            ("TITAN", "Titan Company Ltd", "NSE"),
-            ("ULTRACEMCO", "UltraTech Cement Ltd", "NSE"),
-            ("UPL", "UPL Ltd", "NSE"),
-        ]
-        
-        return set(popular_stocks)
+        return POPULAR_STOCKS
     
-    def get_all_stocks(self) -> List[Dict[str, str]]:
+    async def get_all_stocks(self) -> Set[StockTuple]:
         """
         Get comprehensive list of Indian stocks from all sources
         """
         logger.info("Starting comprehensive stock data collection...")
         all_stocks = set()
         
-        # Try multiple sources
-        try:
-            # Source 1: NSE Official API
-            nse_stocks = self.fetch_nse_stocks()
+        # Source 1: NSE Official API, Source 2: Yahoo Finance - fetched concurrently
+        nse_stocks, yahoo_stocks = await asyncio.gather(
+            self.fetch_nse_stocks(),
+            self.fetch_yahoo_finance_indian_stocks(),
+            return_exceptions=True
+        )
+        
+        if isinstance(nse_stocks, Exception):
+            logger.error(f"NSE fetch failed: {nse_stocks}")
+        else:
             all_stocks.update(nse_stocks)
-        except Exception as e:
-            logger.error(f"NSE fetch failed: {e}")
         
-        try:
-            # Source 2: Yahoo Finance
-            yahoo_stocks = self.fetch_yahoo_finance_indian_stocks()
+        if isinstance(yahoo_stocks, Exception):
+            logger.error(f"Yahoo Finance fetch failed: {yahoo_stocks}")
+        else:
             all_stocks.update(yahoo_stocks)
-        except Exception as e:
-            logger.error(f"Yahoo Finance fetch failed: {e}")
         
         # Source 3: Fallback popular stocks
         if len(all_stocks) < 50:  # If we don't have enough stocks
@@ -223,30 +268,74 @@ class AutomatedStockFetcher:
             popular_stocks = self.fetch_popular_indian_stocks()
             all_stocks.update(popular_stocks)
         
-        # Convert to list of dictionaries
-        stock_list = []
-        for symbol, name, exchange in all_stocks:
-            stock_list.append({
-                'symbol': symbol,
-                'name': name,
-                'exchange': exchange
-            })
-        
-        logger.info(f"Total unique stocks collected: {len(stock_list)}")
-        return stock_list
+        logger.info(f"Total unique stocks collected: {len(all_stocks)}")
+        return all_stocks
+
+async def collect_stocks() -> Set[StockTuple]:
+    """Run the automated stock fetcher with a shared async HTTP client"""
+    async with AutomatedStockFetcher() as fetcher:
+        return await fetcher.get_all_stocks()
+
+def to_naive_ist(dt: datetime) -> datetime:
+    """
+    Convert a timestamp to naive IST wall-clock time, the convention of stocks.last_updated
+    Naive input is taken as server-local time (Yahoo data uses datetime.now()).
+    COPY and executemany then store the same value regardless of session timezone.
+    """
+    return dt.astimezone(IST).replace(tzinfo=None)
+
+def relax_durability(db: Session) -> None:
+    """
+    Skip the per-commit fsync for the insert transaction about to start
+    A crash mid-seed only loses rows that a rerun inserts again.
+    Must be the first statement of each insert transaction: SET LOCAL ends
+    with the transaction, and SQLite rejects the pragma once a write has begun.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == 'sqlite':
+        db.execute(text("PRAGMA synchronous=OFF"))
+    elif dialect == 'postgresql':
+        db.execute(text("SET LOCAL synchronous_commit = OFF"))
+
+def copy_insert_stocks(db: Session, rows: List[Dict]) -> List[str]:
+    """
+    Load rows with COPY FROM STDIN into a temp table, then merge them into stocks
+    COPY skips per-row SQL parsing; the merge keeps ON CONFLICT (symbol) DO NOTHING.
+    PostgreSQL with psycopg2 only. Returns the symbols actually inserted.
+    """
+    columns = ", ".join(SEED_COPY_COLUMNS)
+    db.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS stock_seed ("
+        "symbol TEXT, name TEXT, current_price DOUBLE PRECISION, previous_close DOUBLE PRECISION, "
+        "exchange TEXT, is_active BOOLEAN, last_updated TIMESTAMP"
+        ") ON COMMIT DELETE ROWS"
+    ))
+    
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(tuple(row[column] for column in SEED_COPY_COLUMNS) for row in rows)
+    buffer.seek(0)
+    
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY stock_seed ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+    
+    return db.scalars(text(
+        f"INSERT INTO stocks ({columns}) SELECT {columns} FROM stock_seed "
+        "ON CONFLICT (symbol) DO NOTHING RETURNING symbol"
+    )).all()
 
 def seed_stocks():
     """Automatically seed the database with comprehensive Indian stock data"""
-    # Get a database session
-    db = next(get_db())
+    # Nothing is read back through ORM instances after a commit, so skip expiring them
+    # (SessionLocal already has autoflush disabled)
+    db = SessionLocal(expire_on_commit=False)
     
     try:
-        # Initialize the automated stock fetcher
-        fetcher = AutomatedStockFetcher()
-        
         # Get comprehensive stock list from multiple sources
         logger.info("Fetching comprehensive stock data from multiple sources...")
-        all_stocks = fetcher.get_all_stocks()
+        all_stocks = asyncio.run(collect_stocks())
         
         if not all_stocks:
             logger.error("No stocks fetched from any source!")
@@ -254,9 +343,12 @@ def seed_stocks():
         
         logger.info(f"Found {len(all_stocks)} stocks from all sources")
         
-        # Check which stocks already exist
-        existing_symbols = {stock.symbol for stock in db.query(Stock).all()}
-        new_stocks = [stock for stock in all_stocks if stock['symbol'] not in existing_symbols]
+        # Check which stocks already exist, so we don't price them on Yahoo again
+        existing_symbols = set(db.scalars(select(Stock.symbol)))
+        # End the read transaction now instead of holding it open while the
+        # first batch is priced; each insert batch opens its own
+        db.rollback()
+        new_stocks = [stock for stock in all_stocks if stock[0] not in existing_symbols]
         
         if not new_stocks:
             logger.info("All fetched stocks already exist in the database.")
@@ -264,74 +356,83 @@ def seed_stocks():
         
         logger.info(f"Adding {len(new_stocks)} new stocks to database...")
         
-        # Process stocks in batches to avoid overwhelming Yahoo Finance
-        batch_size = 20
+        # One executemany INSERT per chunk instead of a unit-of-work flush per row.
+        # ON CONFLICT lets the unique symbol constraint skip rows that already exist
+        # (or appear under several sources) instead of failing the whole chunk.
+        dialect = db.get_bind().dialect.name
+        if dialect not in UPSERT_INSERTS:
+            raise NotImplementedError(f"Stock upsert is not supported on {dialect}")
+        stmt = (
+            UPSERT_INSERTS[dialect](Stock)
+            .on_conflict_do_nothing(index_elements=['symbol'])
+            .returning(Stock.symbol)
+        )
+        # On PostgreSQL + psycopg2 each chunk goes through COPY instead
+        use_copy = dialect == 'postgresql' and db.get_bind().dialect.driver == 'psycopg2'
+        
+        # Yahoo Finance calls are I/O-bound per symbol, so the thread pool produces
+        # priced rows while this thread consumes them, inserting every
+        # INSERT_BATCH_SIZE rows; the pool width bounds requests in flight
+        logger.info(f"Fetching prices for {len(new_stocks)} stocks with {YAHOO_MAX_WORKERS} workers...")
         successful_additions = 0
+        batch_number = 0
+        total_batches = (len(new_stocks) - 1) // INSERT_BATCH_SIZE + 1
+        rows = []
         
-        for i in range(0, len(new_stocks), batch_size):
-            batch = new_stocks[i:i + batch_size]
-            batch_symbols = [stock['symbol'] for stock in batch]
-            
-            logger.info(f"Processing batch {i//batch_size + 1}/{(len(new_stocks)-1)//batch_size + 1} ({len(batch)} stocks)")
+        with ThreadPoolExecutor(max_workers=YAHOO_MAX_WORKERS) as pool:
+            stock_data_list = pool.map(
+                StockDataService.get_cached_stock_data,
+                [symbol for symbol, _, _ in new_stocks]
+            )
             
-            try:
-                # Get detailed stock data from Yahoo Finance
-                stock_data_list = StockDataService.get_multiple_stocks(batch_symbols)
+            for index, ((symbol, name, exchange), data) in enumerate(zip(new_stocks, stock_data_list), start=1):
+                if data:
+                    rows.append({
+                        'symbol': symbol,
+                        'name': data["name"],
+                        'current_price': data["current_price"],
+                        'previous_close': data["previous_close"],
+                        'exchange': exchange,
+                        'is_active': True,
+                        'last_updated': to_naive_ist(data["updated_at"]),
+                    })
+                else:
+                    # Use basic info with default price
+                    rows.append({
+                        'symbol': symbol,
+                        'name': name,
+                        'current_price': 100.0,  # Default price
+                        'previous_close': 100.0,
+                        'exchange': exchange,
+                        'is_active': True,
+                        'last_updated': to_naive_ist(get_ist_timestamp()),
+                    })
                 
-                # Create a lookup for detailed data
-                detailed_data = {data['symbol']: data for data in stock_data_list}
-                
-                # Add stocks to database
-                for stock_info in batch:
-                    symbol = stock_info['symbol']
-                    try:
-                        # Use detailed data if available, otherwise use basic info
-                        if symbol in detailed_data:
-                            data = detailed_data[symbol]
-                            stock = Stock(
-                                symbol=symbol,
-                                name=data["name"],
-                                current_price=data["current_price"],
-                                previous_close=data["previous_close"],
-                                exchange=stock_info['exchange'],
-                                is_active=True,
-                                last_updated=data["updated_at"]
-                            )
-                        else:
-                            # Use basic info with default price
-                            stock = Stock(
-                                symbol=symbol,
-                                name=stock_info["name"],
-                                current_price=100.0,  # Default price
-                                previous_close=100.0,
-                                exchange=stock_info['exchange'],
-                                is_active=True
-                            )
-                        
-                        db.add(stock)
-                        successful_additions += 1
-                        logger.info(f"Added stock: {symbol} ({stock.name})")
-                        
-                    except Exception as e:
-                        logger.error(f"Error adding stock {symbol}: {e}")
-                        continue
-                
-                # Commit this batch
-                db.commit()
-                logger.info(f"Committed batch {i//batch_size + 1}")
-                
-                # Be respectful to APIs
-                time.sleep(2)
+                if len(rows) < INSERT_BATCH_SIZE and index < len(new_stocks):
+                    continue
                 
-            except Exception as e:
-                logger.error(f"Error processing batch starting at {i}: {e}")
-                db.rollback()
-                continue
+                batch_number += 1
+                try:
+                    relax_durability(db)
+                    if use_copy:
+                        added_symbols = copy_insert_stocks(db, rows)
+                    else:
+                        added_symbols = db.scalars(stmt, rows).all()
+                    db.commit()
+                    successful_additions += len(added_symbols)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        for symbol in added_symbols:
+                            logger.debug(f"Added stock: {symbol}")
+                    logger.info(f"Inserted batch {batch_number}/{total_batches} ({successful_additions} stocks added so far)")
+                except Exception as e:
+                    logger.error(f"Error inserting batch {batch_number}: {e}")
+                    db.rollback()
+                rows = []
         
         logger.info(f"Database seeding completed! Successfully added {successful_additions} stocks.")
         
         # Final count
-        total_stocks = db.query(Stock).count()
+        total_stocks = db.scalar(select(func.count()).select_from(Stock))
         logger.info(f"Total stocks in database: {total_stocks}")
         
     except Exception as e:
@@ -4,6 +4,7 @@ Script to test the stock data service without starting the full API
 Run with: python -m scripts.test_stock_data
 """
 
+import asyncio
 import sys
 import os
 import logging
@@ -36,21 +37,23 @@ def test_stock_data():
     
     logger.info(f"Testing stock data service with symbols: {symbols}")
     
-    # Fetch data for multiple stocks
-    results = StockDataService.get_multiple_stocks(symbols)
+    # Fetch data for multiple stocks concurrently
+    results = asyncio.run(StockDataService.get_multiple_stocks_async(symbols))
     
-    # Print results in a table format
-    logger.info(f"\n{'Symbol':<10} {'Name':<30} {'Price':<10} {'Change':<10} {'Change %':<10}")
-    logger.info("-" * 70)
-    
-    for stock in results:
-        logger.info(
-            f"{stock['symbol']:<10} "
-            f"{stock['name'][:28]:<30} "
-            f"{stock['current_price']:<10.2f} "
-            f"{stock['change']:<10.2f} "
-            f"{stock['change_percent']:<10.2f}%"
-        )
+    # Print results in a table format, as a single log record
+    lines = [
+        f"{'Symbol':<10} {'Name':<30} {'Price':<10} {'Change':<10} {'Change %':<10}",
+        "-" * 70,
+    ]
+    lines.extend(
+        f"{stock['symbol']:<10} "
+        f"{stock['name'][:28]:<30} "
+        f"{stock['current_price']:<10.2f} "
+        f"{stock['change']:<10.2f} "
+        f"{stock['change_percent']:<10.2f}%"
+        for stock in results
+    )
+    logger.info("\n" + "\n".join(lines))
 
 if __name__ == "__main__":
     test_stock_data()
@@ -16,14 +16,15 @@ from app.models.models import User, Portfolio, Stock, Position, Transaction
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Models are imported above so they're registered with the metadata
+TABLE_NAMES = tuple(Base.metadata.tables)
+
 def init_db():
     """Create database tables"""
     logger.info("Creating database tables")
     
-    # Import all models to ensure they're registered with the metadata
-    logger.info("Registered models:")
-    for table_name, table in Base.metadata.tables.items():
-        logger.info(f" - {table_name}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Registered models: {', '.join(TABLE_NAMES)}")
     
     # Create all tables
     Base.metadata.create_all(bind=engine)
@@ -160,24 +160,22 @@ def setup_supabase():
             """
         ]
 
-        # Execute SQL statements
-        logger.info("Creating database tables...")
-        for sql in SQL_STATEMENTS:
-            try:
-                # We use RPC for admin-level SQL execution
-                data = supabase.rpc('supabase_admin_query', {'query_text': sql}).execute()
-                logger.info(f"SQL executed successfully.")
-            except Exception as e:
-                logger.error(f"Error executing SQL: {e}")
-                
-        # Insert sample stocks
-        logger.info("\nInserting sample stock data...")
-        for sql in SAMPLE_STOCKS:
-            try:
-                data = supabase.rpc('supabase_admin_query', {'query_text': sql}).execute()
-                logger.info(f"Sample stocks inserted successfully.")
-            except Exception as e:
-                logger.error(f"Error inserting sample stocks: {e}")
+        # Execute the schema and sample data as one script in a single RPC round-trip;
+        # the RPC call runs in its own transaction, so a failing statement rolls the whole setup back
+        full_sql = "\n".join(SQL_STATEMENTS + SAMPLE_STOCKS)
+        
+        logger.info(f"Creating database tables and inserting sample stock data ({len(SQL_STATEMENTS) + len(SAMPLE_STOCKS)} statements)...")
+        if logger.isEnabledFor(logging.DEBUG):
+            for sql in SQL_STATEMENTS + SAMPLE_STOCKS:
+                logger.debug(f"Queued SQL: {sql.strip().splitlines()[0]}")
+        
+        try:
+            # We use RPC for admin-level SQL execution
+            data = supabase.rpc('supabase_admin_query', {'query_text': full_sql}).execute()
+            logger.info("SQL executed successfully.")
+        except Exception as e:
+            logger.error(f"Error executing SQL: {e}")
+            return False
         
         logger.info("\nDatabase setup complete!")
         return True
@@ -3,48 +3,80 @@ Script to simulate realistic price changes for demonstration
 This will create varied price movements to show the system working
 """
 
-import random
-from datetime import datetime
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.orm import Session
 
 from app.core.database import SessionLocal
 from app.models.models import Stock
 
-def simulate_price_changes():
-    """Simulate realistic price changes for popular stocks"""
+# One generator seeded from OS entropy at import, reused by every run; it is not
+# shared through the global random module state or its lock
+_rng = np.random.default_rng()
+
+# Core UPDATE keyed by primary key, executed once per run with every row's parameters
+stocks_table = Stock.__table__
+PRICE_UPDATE_STMT = (
+    update(stocks_table)
+    .where(stocks_table.c.id == bindparam("stock_id"))
+    .values(
+        previous_close=bindparam("new_previous_close"),
+        current_price=bindparam("new_price"),
+        last_updated=bindparam("updated_at"),
+    )
+)
+
+def simulate_price_changes(verbose: bool = False):
+    """Simulate realistic price changes for popular stocks (per-stock output only when verbose)"""
     
     print("🎯 Simulating realistic price changes for demonstration...")
     
-    db = SessionLocal()
-    
     try:
-        # Get some popular stocks to simulate
-        popular_symbols = ["TCS", "HDFCBANK", "ICICIBANK", "INFY", "RELIANCE"]
-        
-        for symbol in popular_symbols:
-            stock = db.query(Stock).filter(Stock.symbol == symbol).first()
+        # One transaction for the whole run: commits on success, rolls back on error
+        with SessionLocal() as db, db.begin():
+            # Get some popular stocks to simulate
+            popular_symbols = ["TCS", "HDFCBANK", "ICICIBANK", "INFY", "RELIANCE"]
             
-            if stock:
+            # One SELECT for all symbols and one Core executemany UPDATE, instead of a
+            # query plus an ORM flush per stock
+            stocks = db.execute(
+                select(Stock.id, Stock.symbol, Stock.current_price)
+                .where(Stock.symbol.in_(popular_symbols))
+            ).all()
+            # Stored as naive UTC
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            
+            # Draw every price change (-5% to +5%) at once and apply them as one vector op
+            prices = np.fromiter((stock.current_price for stock in stocks), dtype=np.float64, count=len(stocks))
+            change_percents = _rng.uniform(-5.0, 5.0, size=len(stocks))
+            new_prices = prices * (1 + change_percents / 100)
+            
+            params = []
+            for stock, change_percent, new_price in zip(stocks, change_percents.tolist(), new_prices.tolist()):
                 # Store current price as previous close
-                stock.previous_close = stock.current_price
-                
-                # Generate a realistic price change (-5% to +5%)
-                change_percent = random.uniform(-5.0, 5.0)
-                new_price = stock.current_price * (1 + change_percent / 100)
+                params.append({
+                    "stock_id": stock.id,
+                    "new_previous_close": stock.current_price,
+                    "new_price": new_price,
+                    "updated_at": now,
+                })
                 
-                stock.current_price = new_price
-                stock.last_updated = datetime.utcnow()
-                
-                print(f"📈 {symbol}: ₹{stock.previous_close:.2f} → ₹{new_price:.2f} ({change_percent:+.2f}%)")
+                if verbose:
+                    print(f"📈 {stock.symbol}: ₹{stock.current_price:.2f} → ₹{new_price:.2f} ({change_percent:+.2f}%)")
+            
+            if params:
+                db.execute(PRICE_UPDATE_STMT, params)
         
-        db.commit()
         print("✅ Price simulation completed!")
         
     except Exception as e:
         print(f"❌ Error simulating prices: {e}")
-        db.rollback()
-    finally:
-        db.close()
 
 if __name__ == "__main__":
-    simulate_price_changes()
+    parser = argparse.ArgumentParser(description="Simulate price changes for popular stocks")
+    parser.add_argument("--verbose", action="store_true", help="print each simulated price change")
+    args = parser.parse_args()
+    simulate_price_changes(verbose=args.verbose)
@@ -6,9 +6,9 @@ like those from the database
 """
 
 import sys
-sys.path.append('.')
-
 from datetime import datetime
+
+import pandas as pd
 from app.core.timezone_utils import format_ist_for_api
 
 print("=== Testing format_ist_for_api function ===")
@@ -26,15 +26,21 @@ print(f"Expected: Should show time around 12:23:38 PM IST")
 
 # Test with different times
 print("\n=== Multiple test cases ===")
-test_cases = [
+test_cases = (
     datetime(2025, 1, 30, 0, 0, 0),   # Midnight UTC -> 5:30 AM IST
     datetime(2025, 1, 30, 12, 0, 0),  # Noon UTC -> 5:30 PM IST  
     datetime(2025, 1, 30, 18, 30, 0), # 6:30 PM UTC -> 12:00 AM IST (next day)
-]
+)
+
+sys.stdout.write("\n".join(
+    f"UTC: {utc_time} -> IST: {format_ist_for_api(utc_time)}" for utc_time in test_cases
+) + "\n")
 
-for utc_time in test_cases:
-    ist_formatted = format_ist_for_api(utc_time)
-    print(f"UTC: {utc_time} -> IST: {ist_formatted}")
+# Sweep the whole day in 30-minute steps, generated in one call rather than per datetime
+print("\n=== Half-hourly sweep ===")
+sweep = pd.date_range("2025-01-30", periods=48, freq="30min").to_pydatetime()
+sweep_results = list(map(format_ist_for_api, sweep))
+print(f"{sum(result.endswith('+05:30') for result in sweep_results)}/{len(sweep)} timestamps converted to IST")
 
 print("\n✅ Timezone conversion working correctly!")
 print("Frontend should now show correct IST times instead of UTC times.")
@@ -4,12 +4,7 @@
 Test script to verify IST timezone functionality
 """
 
-import sys
-import os
-from datetime import datetime
-
-# Add the Backend directory to the Python path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from datetime import datetime, timezone
 
 from app.core.timezone_utils import get_ist_now, format_ist_datetime, get_ist_timestamp, format_ist_for_api
 
@@ -34,7 +29,7 @@ def test_timezone_functions():
     print(f"Human-readable IST datetime: {formatted_time}")
     
     # Test with a UTC datetime
-    utc_time = datetime.utcnow()
+    utc_time = datetime.now(timezone.utc)
     print(f"\nUTC time: {utc_time}")
     
     # Simulate what would happen in the API
@@ -5,12 +5,8 @@ Test script to simulate transaction timestamp creation and formatting
 """
 
 import sys
-import os
 from datetime import datetime, timedelta
 
-# Add the Backend directory to the Python path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
 from app.core.timezone_utils import get_ist_now, format_ist_for_api, get_ist_timestamp
 
 def simulate_transaction_api_response():
@@ -56,30 +52,25 @@ def simulate_transaction_api_response():
     })
     
     # Format the API response (similar to what our API would return)
-    formatted_transactions = []
-    for transaction in transactions:
-        formatted_transaction = {
-            "id": transaction["id"],
-            "stock_symbol": transaction["stock_symbol"],
-            "transaction_type": transaction["transaction_type"],
-            "shares": transaction["shares"],
-            "price": transaction["price"],
-            "total_amount": transaction["total_amount"],
-            "timestamp": format_ist_for_api(transaction["timestamp"])
-        }
-        formatted_transactions.append(formatted_transaction)
+    format_timestamp = format_ist_for_api
+    formatted_transactions = [
+        {**transaction, "timestamp": format_timestamp(transaction["timestamp"])}
+        for transaction in transactions
+    ]
     
-    print("API Response (formatted for frontend):")
-    print("-" * 50)
+    lines = ["API Response (formatted for frontend):", "-" * 50]
     for txn in formatted_transactions:
-        print(f"ID: {txn['id']}")
-        print(f"Stock: {txn['stock_symbol']}")
-        print(f"Type: {txn['transaction_type']}")
-        print(f"Shares: {txn['shares']}")
-        print(f"Price: ₹{txn['price']}")
-        print(f"Total: ₹{txn['total_amount']}")
-        print(f"📅 Timestamp: {txn['timestamp']} (IST - JavaScript compatible)")  # This is what the frontend will see
-        print("-" * 50)
+        lines += [
+            f"ID: {txn['id']}",
+            f"Stock: {txn['stock_symbol']}",
+            f"Type: {txn['transaction_type']}",
+            f"Shares: {txn['shares']}",
+            f"Price: ₹{txn['price']}",
+            f"Total: ₹{txn['total_amount']}",
+            f"📅 Timestamp: {txn['timestamp']} (IST - JavaScript compatible)",  # This is what the frontend will see
+            "-" * 50,
+        ]
+    sys.stdout.write("\n".join(lines) + "\n")
     
     print("\n✅ Transaction timestamps are now in JavaScript-compatible ISO format!")
     print("✅ Frontend will correctly parse IST timestamps with new Date()")
@@ -5,8 +5,12 @@ Tests the AlphaLearn WebSocket endpoints for real-time functionality
 """
 import asyncio
 import websockets
-import json
-import time
+import orjson
+
+async def _recv_loop(websocket, queue: asyncio.Queue):
+    """Read frames into the queue so JSON parsing never holds up the socket"""
+    async for message in websocket:
+        await queue.put(message)
 
 async def test_leaderboard_websocket():
     """Test the leaderboard WebSocket endpoint"""
@@ -15,39 +19,56 @@ async def test_leaderboard_websocket():
     try:
         print("🔗 Connecting to leaderboard WebSocket...")
         
-        async with websockets.connect(uri) as websocket:
+        # No per-message compression, a bounded frame size and receive queue, and no
+        # keepalive pings during the short test window
+        async with websockets.connect(
+            uri,
+            compression=None,
+            max_size=1 << 20,
+            max_queue=4,
+            open_timeout=5,
+            ping_interval=None,
+        ) as websocket:
             print("✅ Connected to leaderboard WebSocket!")
             
             # Wait for initial data
             print("📡 Waiting for leaderboard data...")
             
-            # Listen for messages for 10 seconds
-            timeout = 10
-            start_time = time.time()
+            # Receive on one task and parse here, with a bounded buffer in between
+            queue = asyncio.Queue(maxsize=8)
+            producer = asyncio.create_task(_recv_loop(websocket, queue))
             
-            while time.time() - start_time < timeout:
-                try:
-                    # Wait for message with timeout
-                    message = await asyncio.wait_for(websocket.recv(), timeout=2.0)
-                    data = json.loads(message)
-                    
-                    print("📊 Received leaderboard update:")
-                    print(f"   Total users: {data.get('total_users', 'N/A')}")
-                    print(f"   Leaderboard entries: {len(data.get('leaderboard', []))}")
-                    
-                    if data.get('leaderboard'):
-                        top_trader = data['leaderboard'][0]
-                        print(f"   Top trader: {top_trader.get('username', 'N/A')} (₹{top_trader.get('portfolio_value', 0):,.2f})")
-                    
-                    print("---")
-                    break  # Exit after receiving first message
-                    
-                except asyncio.TimeoutError:
-                    print("⏰ No message received (timeout)")
-                    continue
-                except json.JSONDecodeError as e:
-                    print(f"❌ JSON decode error: {e}")
-                    continue
+            try:
+                # Listen for messages for 10 seconds, against one monotonic deadline
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + 10
+                
+                while (remaining := deadline - loop.time()) > 0:
+                    try:
+                        # Wait for message with timeout
+                        message = await asyncio.wait_for(queue.get(), timeout=min(2.0, remaining))
+                        data = orjson.loads(message)
+                        
+                        print("📊 Received leaderboard update:")
+                        print(f"   Total users: {data.get('total_users', 'N/A')}")
+                        print(f"   Leaderboard entries: {len(data.get('leaderboard', []))}")
+                        
+                        if data.get('leaderboard'):
+                            top_trader = data['leaderboard'][0]
+                            print(f"   Top trader: {top_trader.get('username', 'N/A')} (₹{top_trader.get('portfolio_value', 0):,.2f})")
+                        
+                        print("---")
+                        break  # Exit after receiving first message
+                        
+                    except asyncio.TimeoutError:
+                        print("⏰ No message received (timeout)")
+                        continue
+                    except orjson.JSONDecodeError as e:
+                        print(f"❌ JSON decode error: {e}")
+                        continue
+                
+            finally:
+                producer.cancel()
             
             print("✅ Test completed successfully!")
             
@@ -0,0 +1,63 @@
+"""
+Shared helpers for the scripts that shift naive UTC timestamps to IST
+(convert_timestamps_to_ist.py and fix_timezone_database.py)
+"""
+
+from zoneinfo import ZoneInfo
+from sqlalchemy import func, or_, select, update
+
+from app.core.config import settings
+from app.models.models import Transaction, User, Portfolio
+
+# Timezones are resolved once instead of per row
+UTC = ZoneInfo("UTC")
+IST = ZoneInfo(settings.TIMEZONE)
+
+# Rows are streamed from the database in chunks of this size
+STREAM_BATCH_SIZE = 1000
+
+# Timestamp columns shifted in each table
+TIMESTAMP_COLUMNS = (
+    (Transaction, ("timestamp",)),
+    (User, ("created_at", "updated_at")),
+    (Portfolio, ("created_at", "updated_at")),
+)
+
+def stream_rows(db, model):
+    """
+    Stream all rows of a model in STREAM_BATCH_SIZE chunks instead of
+    loading the whole table into memory
+    """
+    result = db.execute(select(model).execution_options(yield_per=STREAM_BATCH_SIZE))
+    yield from result.scalars().partitions()
+
+def release_batch(db):
+    """
+    Flush pending changes and drop processed rows from the identity map
+    """
+    db.flush()
+    db.expunge_all()
+
+def shift_table_in_database(db, model, columns) -> int:
+    """
+    Shift a table's naive UTC timestamp columns to IST with a single UPDATE
+    Uses PostgreSQL's AT TIME ZONE (via timezone()), so nothing is loaded into Python
+    """
+    values = {
+        column: func.timezone(IST.key, func.timezone('UTC', getattr(model, column)))
+        for column in columns
+    }
+    result = db.execute(
+        update(model)
+        .where(or_(*(getattr(model, column).isnot(None) for column in columns)))
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+def shift_tables_in_database(db):
+    """
+    Shift every timestamp table in the caller's transaction
+    The shift is not idempotent, so all tables must commit or roll back together
+    """
+    return tuple(shift_table_in_database(db, model, columns) for model, columns in TIMESTAMP_COLUMNS)
@@ -1,9 +1,15 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+import orjson
 
 # Test the backend API endpoints
 BASE_URL = "http://localhost:8000/api/v1"
 
+# One keep-alive session shared by every request instead of a new connection per call
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
 def test_register():
     """Test user registration"""
     print("Testing registration...")
@@ -16,7 +22,11 @@ def test_register():
     }
     
     try:
-        response = requests.post(f"{BASE_URL}/auth/register", json=data)
+        response = SESSION.post(
+            f"{BASE_URL}/auth/register",
+            data=orjson.dumps(data),
+            headers={"Content-Type": "application/json"}
+        )
         print(f"Registration Status: {response.status_code}")
         print(f"Registration Response: {response.text}")
         
@@ -44,7 +54,7 @@ def test_login(user_data):
     }
     
     try:
-        response = requests.post(f"{BASE_URL}/auth/login", data=data)
+        response = SESSION.post(f"{BASE_URL}/auth/login", data=data)
         print(f"Login Status: {response.status_code}")
         print(f"Login Response: {response.text}")
         